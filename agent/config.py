@@ -20,4 +20,39 @@ PLANNER_MODEL = "gpt-4o-mini"
 DATE_PARSER_MODEL = "gpt-3.5-turbo"
 
 # A new model used for synthesizing responses
-SYNTHESIZER_MODEL = "gpt-4o-mini" 
\ No newline at end of file
+SYNTHESIZER_MODEL = "gpt-4o-mini" 
+
+# Maximum number of tool outputs kept in the in-memory action cache.
+ACTION_CACHE_SIZE = 256
+
+# Optional directory used to persist the action cache across processes,
+# e.g. "~/.agentcp/cache". Set to None to keep the cache in memory only.
+ACTION_CACHE_DIR = None
+
+# Business lines are reference data that can change; cached lookups expire after this many seconds.
+BUSINESS_LINES_CACHE_TTL = 3600
+
+# Safety limit on node transitions in a single workflow run (guards against plan-correction loops).
+MAX_WORKFLOW_TRANSITIONS = 50
+
+# Connection pool used by the async LLM client shared across concurrent workflow runs.
+LLM_MAX_CONNECTIONS = 64
+LLM_MAX_KEEPALIVE_CONNECTIONS = 32
+# Seconds before an LLM request times out.
+LLM_TIMEOUT = 60
+
+# Seconds a plan is reused by the workflow's node cache for an identical query.
+PLANNER_CACHE_TTL = 300
+
+# Maximum number of SimpleQueryTool results memoized per tool instance.
+QUERY_CACHE_SIZE = 1000
+
+# Maximum number of compiled code snippets kept by the code executor.
+COMPILED_CODE_CACHE_SIZE = 128
+
+# Maximum number of date ranges remembered by each of the date resolver caches
+# (resolved descriptions, and the LLM parses behind them).
+DATE_RANGE_CACHE_SIZE = 512
+
+# Maximum number of client name lists whose resolved IDs are memoized.
+CLIENT_RESOLUTION_CACHE_SIZE = 512
@@ -3,11 +3,26 @@ Centralized provider for the LLM client.
 This ensures the client is initialized only once and can be easily swapped.
 """
 
+import asyncio
 import os
-from openai import OpenAI
+import weakref
+import httpx
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 
+from .config import LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_TIMEOUT
+
 _client = None
+# Async clients hold connections bound to the event loop that opened them, so keep one per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def _get_api_key() -> str:
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable not set.")
+    return api_key
 
 def get_llm_client() -> OpenAI:
     """
@@ -16,9 +31,38 @@ def get_llm_client() -> OpenAI:
     """
     global _client
     if _client is None:
-        load_dotenv()
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable not set.")
-        _client = OpenAI(api_key=api_key)
-    return _client 
\ No newline at end of file
+        _client = OpenAI(api_key=_get_api_key())
+    return _client
+
+
+def get_async_llm_client() -> AsyncOpenAI:
+    """
+    Returns the AsyncOpenAI client for the running event loop.
+    All planner and synthesizer calls made on that loop share one pooled
+    connection set, so concurrent workflows reuse keep-alive connections
+    instead of opening a new one per call.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=LLM_TIMEOUT,
+        )
+        client = AsyncOpenAI(api_key=_get_api_key(), http_client=http_client)
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_llm_client() -> None:
+    """
+    Closes the AsyncOpenAI client of the running event loop, if one was created.
+    Call this before a loop that is about to finish (e.g. one started by asyncio.run),
+    otherwise its pooled connections are never released.
+    """
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
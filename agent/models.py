@@ -1,9 +1,44 @@
-from pydantic import BaseModel, Field, validator
-from typing import List, Literal, Optional, Union, Any
+from pydantic import BaseModel, Field, PrivateAttr, validator
+from pydantic.json_schema import SkipJsonSchema
+from typing import Any, Dict, FrozenSet, List, Literal, Optional, Union
+
+# --- Shared validators ---
+
+def validate_granularity(field: str, v: List[str], row_granularity: Optional[List[str]] = None) -> List[str]:
+    """
+    Checks a row/col granularity list: no duplicates, no overlap with `row_granularity`
+    (for column dimensions), and 'aggregate' only on its own.
+    The set of values is built once and reused for every check.
+    """
+    values = set(v)
+    if len(values) != len(v):
+        raise ValueError(f"{field} cannot contain duplicate values")
+    
+    if row_granularity:
+        overlap = values.intersection(row_granularity)
+        if overlap:
+            raise ValueError(f"{field} cannot contain values that are already in row_granularity: {overlap}")
+    
+    # Special validation: if aggregate is included, it must be the only value
+    if "aggregate" in values and len(v) > 1:
+        raise ValueError(f"When 'aggregate' is used in {field}, it must be the only value")
+    
+    return v
 
 # --- Parameter models for each available tool ---
 
-class DataFetchParameters(BaseModel):
+class ToolParameters(BaseModel):
+    """Base class for tool parameters. Memoizes the dict form, which executors read on every step and retry."""
+    _dict_cache: Dict[FrozenSet[str], Dict[str, Any]] = PrivateAttr(default_factory=dict)
+
+    def cached_dict(self, exclude: FrozenSet[str] = frozenset()) -> Dict[str, Any]:
+        """Returns `model_dump(exclude=exclude)`, computed once per instance. Treat the result as read-only."""
+        cached = self._dict_cache.get(exclude)
+        if cached is None:
+            cached = self._dict_cache[exclude] = self.model_dump(exclude=set(exclude))
+        return cached
+
+class DataFetchParameters(ToolParameters):
     """Parameters for fetching data from our APIs."""
     metric: Literal["revenues", "balances", "balances_decomposition", "Total RWA", "Portfolio RWA", "Borrow RWA", "Balance Sheet", "Supplemental Balance Sheet", "GSIB Points", "Total AE", "Preferred AE"]
     entities: List[str]
@@ -23,49 +58,28 @@ class DataFetchParameters(BaseModel):
     @validator('row_granularity')
     def validate_row_granularity(cls, v):
         """Ensure row_granularity has no duplicates and valid combinations."""
-        if len(v) != len(set(v)):
-            raise ValueError("row_granularity cannot contain duplicate values")
-        
-        # Special validation: if aggregate is included, it must be the only value
-        if "aggregate" in v and len(v) > 1:
-            raise ValueError("When 'aggregate' is used in row_granularity, it must be the only value")
-        
-        return v
+        return validate_granularity("row_granularity", v)
 
     @validator('col_granularity')
     def validate_col_granularity(cls, v, values):
         """Ensure col_granularity has no duplicates and doesn't overlap with row_granularity."""
         if v is None:
             return v
-        
-        if len(v) != len(set(v)):
-            raise ValueError("col_granularity cannot contain duplicate values")
-        
-        # Check for overlap with row_granularity
-        row_granularity = values.get('row_granularity', [])
-        overlap = set(v) & set(row_granularity)
-        if overlap:
-            raise ValueError(f"col_granularity cannot contain values that are already in row_granularity: {overlap}")
-        
-        # Special validation: if aggregate is included, it must be the only value
-        if "aggregate" in v and len(v) > 1:
-            raise ValueError("When 'aggregate' is used in col_granularity, it must be the only value")
-            
-        return v
-
-class GetValidBusinessLinesParameters(BaseModel):
+        return validate_granularity("col_granularity", v, values.get('row_granularity', []))
+
+class GetValidBusinessLinesParameters(ToolParameters):
     """This tool takes no parameters."""
     pass
 
-class DescribeDataframeParameters(BaseModel):
+class DescribeDataframeParameters(ToolParameters):
     """Parameters for describing a dataframe that is in the workspace."""
     df_name: str = Field(..., description="The name of the dataframe in the workspace to describe.")
 
-class CodeExecutorParameters(BaseModel):
+class CodeExecutorParameters(ToolParameters):
     """Parameters for executing Python code."""
     code: str = Field(..., description="A string of valid Python code to execute. It has access to a dict called 'dataframes'.")
 
-class InformUserParameters(BaseModel):
+class InformUserParameters(ToolParameters):
     """Parameters for the inform_user tool."""
     message: str = Field(..., description="The message to be sent to the user.")
 
@@ -101,4 +115,6 @@ PlanStep = Union[DataFetchStep, DescribeDataframeStep, CodeExecutorStep, GetVali
 
 # The final plan is a list of these steps
 class MultiStepPlan(BaseModel):
-    plan: List[PlanStep] 
\ No newline at end of file
+    plan: List[PlanStep]
+    # Set by the planner (not the LLM) for info-only plans whose last step already answers the query
+    skip_synthesis: SkipJsonSchema[bool] = False 
\ No newline at end of file
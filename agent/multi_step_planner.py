@@ -1,12 +1,12 @@
 import json
-import matplotlib.pyplot as plt
-import pandas as pd
-import os
 
 from .models import MultiStepPlan
-from .llm_client import get_llm_client
+from .llm_client import get_async_llm_client, get_llm_client
 from .config import PLANNER_MODEL
 
+# Tools whose output answers the query directly; plans ending with one skip response synthesis
+INFO_ONLY_TOOLS = {"describe_dataframe", "get_valid_business_lines"}
+
 class MultiStepPlanner:
     """
     The advanced "brain" of the agent.
@@ -526,7 +526,7 @@ Your available tools are:
    - For capital-related metrics (Total RWA, Portfolio RWA, Total AE, etc.), supported row_granularities are: "aggregate", "client", "date", "business", "subbusiness". Supported col_granularities are: "aggregate", "business", "subbusiness".
    - For `balances_decomposition`, col_granularity is not typically used, but row_granularity follows the same pattern.
 2. `describe_dataframe`: To see the schema (columns and data types) of a dataframe that you have fetched.
-3. `code_executor`: To perform any kind of analysis on the dataframes using Python and the pandas library. The final line of your code block MUST be an expression that results in a pandas DataFrame, which will be saved back to the workspace.
+3. `code_executor`: To perform any kind of analysis on the dataframes using Python and the pandas library. The final line of your code block MUST be an expression that results in a pandas DataFrame, which will be saved back to the workspace. Dimension columns such as `client_id`, `business` and `region` are categorical, so always pass `observed=True` to `groupby`.
 4. `get_valid_business_lines`: To get a list of valid `business` and `subbusiness` values for the `data_fetch` tool.
 5. `inform_user`: To send a message to the user, for example to inform them that their query cannot be fulfilled.
 
@@ -540,6 +540,22 @@ For each step in the plan, you must provide:
 """
         return prompt
 
+    def _messages(self, user_query: str) -> list:
+        return [
+            {"role": "system", "content": self._system_prompt},
+            {"role": "user", "content": user_query}
+        ]
+
+    def _parse_plan(self, response) -> MultiStepPlan:
+        response_json = json.loads(response.choices[0].message.content)
+        print(f"LLM Raw Plan:\n{json.dumps(response_json, indent=2)}")
+        
+        plan = MultiStepPlan.model_validate(response_json)
+        plan.skip_synthesis = bool(plan.plan) and plan.plan[-1].tool_name in INFO_ONLY_TOOLS
+        
+        print("--- Planner: Plan created successfully ---")
+        return plan
+
     def create_plan(self, user_query: str) -> MultiStepPlan:
         """
         Takes a user query, calls the LLM, and parses the response into a
@@ -549,17 +565,18 @@ For each step in the plan, you must provide:
         
         response = self.client.chat.completions.create(
             model=PLANNER_MODEL,
-            messages=[
-                {"role": "system", "content": self._system_prompt},
-                {"role": "user", "content": user_query}
-            ],
+            messages=self._messages(user_query),
             response_format={"type": "json_object"}
         )
+        return self._parse_plan(response)
+
+    async def acreate_plan(self, user_query: str) -> MultiStepPlan:
+        """Async version of `create_plan`, using the pooled client of the running event loop."""
+        print("\n--- Planner: Creating a multi-step plan ---")
         
-        response_json = json.loads(response.choices[0].message.content)
-        print(f"LLM Raw Plan:\n{json.dumps(response_json, indent=2)}")
-        
-        plan = MultiStepPlan.model_validate(response_json)
-        
-        print("--- Planner: Plan created successfully ---")
-        return plan 
\ No newline at end of file
+        response = await get_async_llm_client().chat.completions.create(
+            model=PLANNER_MODEL,
+            messages=self._messages(user_query),
+            response_format={"type": "json_object"}
+        )
+        return self._parse_plan(response)
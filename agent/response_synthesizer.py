@@ -1,10 +1,32 @@
 import json
 import pandas as pd
-from .llm_client import get_llm_client
+from .llm_client import get_async_llm_client, get_llm_client
 from .config import SYNTHESIZER_MODEL
 from .workspace import AgentWorkspace
 from knowledge_base.client_data import CLIENT_URL_SKELETON
 
+_PLOT_IMG_PREFIX = '<img src="'
+_PLOT_IMG_SUFFIX = '" alt="Financial Plot" style="max-width: 800px; width: 100%; height: auto;">'
+
+
+def _client_links(df: pd.DataFrame) -> str:
+    """
+    Pre-renders one Markdown link per distinct client, built column-wise rather than row by row.
+    Long-format frames (e.g. a daily time series) repeat each client on many rows.
+    """
+    url_prefix, _, url_suffix = CLIENT_URL_SKELETON.partition("{client_id}")
+    clients = df[["client_name", "client_id"]].dropna().drop_duplicates()
+    links = ("[" + clients["client_name"].astype(str) + "](" + url_prefix
+             + clients["client_id"].astype(str) + url_suffix + ")")
+    return "\n".join(links.tolist())
+
+
+def _plot_embeds(df: pd.DataFrame) -> str:
+    """Pre-renders the <img> tag for each distinct plot, with the path made absolute."""
+    paths = "/" + df["plot_path"].dropna().astype(str).str.lstrip("/").drop_duplicates()
+    return "\n".join((_PLOT_IMG_PREFIX + paths + _PLOT_IMG_SUFFIX).tolist())
+
+
 class ResponseSynthesizer:
     """
     Takes the final agent workspace and the original user query to synthesize
@@ -20,8 +42,14 @@ class ResponseSynthesizer:
         workspace_summary = "The following dataframes were generated to answer your query:\n"
         for name, df in workspace.dataframes.items():
             workspace_summary += f"\n--- Dataframe: '{name}' ---\n"
-            workspace_summary += df.to_string()
+            # CSV goes through pandas' C writer and is more compact than the padded to_string() layout.
+            # A default RangeIndex carries no information, so it is left out.
+            workspace_summary += df.to_csv(index=not isinstance(df.index, pd.RangeIndex))
             workspace_summary += "\n"
+            if {"client_name", "client_id"}.issubset(df.columns):
+                workspace_summary += f"Client links:\n{_client_links(df)}\n"
+            if "plot_path" in df.columns:
+                workspace_summary += f"Plot embeds:\n{_plot_embeds(df)}\n"
 
         prompt = f"""
 You are an expert financial analyst assistant. Your task is to provide a clear, concise, and user-friendly answer to a user's question based on the data provided.
@@ -45,6 +73,12 @@ You are an expert financial analyst assistant. Your task is to provide a clear,
 """
         return prompt
 
+    def _messages(self, prompt: str) -> list:
+        return [
+            {"role": "system", "content": "You are a helpful financial analyst assistant."},
+            {"role": "user", "content": prompt}
+        ]
+
     def synthesize(self, user_query: str, workspace: AgentWorkspace) -> str:
         """
         Generates the final natural language response.
@@ -54,13 +88,25 @@ You are an expert financial analyst assistant. Your task is to provide a clear,
 
         response = self.client.chat.completions.create(
             model=SYNTHESIZER_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful financial analyst assistant."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self._messages(prompt),
+            temperature=0.5,
+        )
+        
+        final_answer = response.choices[0].message.content
+        print("--- Response Synthesis Finished ---")
+        return final_answer
+
+    async def asynthesize(self, user_query: str, workspace: AgentWorkspace) -> str:
+        """Async version of `synthesize`, using the pooled client of the running event loop."""
+        print("\n--- Synthesizing Final Response ---")
+        prompt = self._build_prompt(user_query, workspace)
+
+        response = await get_async_llm_client().chat.completions.create(
+            model=SYNTHESIZER_MODEL,
+            messages=self._messages(prompt),
             temperature=0.5,
         )
         
         final_answer = response.choices[0].message.content
         print("--- Response Synthesis Finished ---")
-        return final_answer 
\ No newline at end of file
+        return final_answer
@@ -5,11 +5,6 @@ This script demonstrates the LangGraph implementation alongside the original
 implementation, showing the architectural differences and benefits.
 """
 
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-
 def demo_architecture_comparison():
     """Demo showing the architectural differences."""
     print("\\n" + "="*80)
@@ -7,7 +7,7 @@ It mirrors the same architecture as the original but uses LangGraph's graph-base
 
 from .main import main_langgraph, compare_with_original
 from .workflow import create_workflow
-from .state import AgentState, create_initial_state, WorkspaceManager
+from .state import AgentState, create_initial_state, merge_state, WorkspaceManager
 from .nodes import (
     PlannerNode,
     ExecutorNode, 
@@ -22,6 +22,7 @@ __all__ = [
     "create_workflow",
     "AgentState",
     "create_initial_state",
+    "merge_state",
     "WorkspaceManager",
     "PlannerNode",
     "ExecutorNode",
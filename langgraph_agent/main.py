@@ -5,10 +5,6 @@ This module provides the main entry point for the LangGraph-based agent.
 It mirrors the functionality of the original main.py but uses the LangGraph workflow.
 """
 
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from .workflow import create_workflow
 
 
@@ -5,19 +5,99 @@ This module contains all the LangGraph nodes that mirror the functionality
 of the original AgentCP components.
 """
 
-import sys
+import ast
+import asyncio
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import string
+import threading
+from functools import lru_cache
 
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, FrozenSet, List, Optional
+import pandas as pd
 from .state import AgentState, WorkspaceManager
-from agent.multi_step_planner import MultiStepPlanner
-from agent.response_synthesizer import ResponseSynthesizer
-from agent.workspace import AgentWorkspace
 from agent.models import MultiStepPlan, PlanStep
-from tools.query_tool import SimpleQueryTool, SimpleQueryInput, InformUserTool, InformUserInput
-from tools.code_executor import describe_dataframe, execute_python_code
-from tools.resolvers import get_valid_business_lines
+from tools.action_cache import get_action_cache
+from agent.config import BUSINESS_LINES_CACHE_TTL
+
+# The planner, synthesizer and tools pull in openai, matplotlib and rapidfuzz;
+# they are imported where first used so that importing the nodes stays cheap
+if TYPE_CHECKING:
+    from agent.workspace import AgentWorkspace
+
+
+@lru_cache(maxsize=None)
+def _query_input_keys() -> FrozenSet[str]:
+    """DataFetchParameters keys that SimpleQueryInput accepts (by field name or alias)."""
+    from tools.query_tool import SimpleQueryInput
+    return frozenset(
+        field.alias or name for name, field in SimpleQueryInput.model_fields.items()
+    )
+
+
+_OUTPUT_VARIABLE = frozenset({"output_variable"})
+
+# dataframes.<method>('name') calls that read or write a single named frame
+_NAMED_FRAME_METHODS = {"get", "pop", "setdefault"}
+
+
+@lru_cache(maxsize=256)
+def _referenced_names(code: str) -> Optional[FrozenSet[str]]:
+    """
+    Returns the dataframe names the code reads through literal keys,
+    e.g. dataframes['rev'] or dataframes.get('rev'). Plain assignments such as
+    dataframes['out'] = ... are outputs and are not included.
+    Returns None when `dataframes` is used in any other way (iteration, variable
+    keys, passed to a function), in which case every frame is a potential input.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    
+    # dataframes['x'] += ... reads 'x' even though its target is in Store context
+    aug_targets = {id(node.target) for node in ast.walk(tree) if isinstance(node, ast.AugAssign)}
+    
+    names = set()
+    accounted = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+                and node.value.id == "dataframes"
+                and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)):
+            if not isinstance(node.ctx, ast.Store) or id(node) in aug_targets:
+                names.add(node.slice.value)
+            accounted.add(id(node.value))
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and isinstance(node.func.value, ast.Name) and node.func.value.id == "dataframes"
+                and node.func.attr in _NAMED_FRAME_METHODS
+                and node.args and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, str)):
+            names.add(node.args[0].value)
+            accounted.add(id(node.func.value))
+    
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == "dataframes" and id(node) not in accounted:
+            return None
+    return frozenset(names)
+
+
+def _plot_files_exist(frames: Dict[str, pd.DataFrame]) -> bool:
+    """Checks that every plot referenced by the frames is still on disk."""
+    for df in frames.values():
+        if "plot_path" in df.columns:
+            if not all(os.path.exists(path) for path in df["plot_path"].dropna()):
+                return False
+    return True
+
+
+class _ThreadedNode:
+    """
+    Gives a synchronous node an awaitable `ainvoke`.
+    The blocking LLM/tool work runs in a worker thread so that concurrent
+    workflow runs can share one event loop.
+    """
+    
+    async def ainvoke(self, state: AgentState) -> Dict[str, Any]:
+        return await asyncio.to_thread(self, state)
 
 
 class PlannerNode:
@@ -26,6 +106,7 @@ class PlannerNode:
     """
     
     def __init__(self):
+        from agent.multi_step_planner import MultiStepPlanner
         self.planner = MultiStepPlanner()
     
     def __call__(self, state: AgentState) -> Dict[str, Any]:
@@ -35,30 +116,103 @@ class PlannerNode:
         try:
             # Create the plan using the original planner
             plan = self.planner.create_plan(state["user_query"])
-            
-            return {
-                "plan": plan,
-                "status": "executing",
-                "current_step_index": 0,
-                "error_message": None
-            }
-            
         except Exception as e:
-            return {
-                "status": "error",
-                "error_message": f"Planning failed: {str(e)}"
-            }
+            return self._planning_failed(e)
+        return self._planned(plan)
+    
+    async def ainvoke(self, state: AgentState) -> Dict[str, Any]:
+        """Execute the planning phase without blocking the event loop."""
+        print("\n--- LangGraph Planner: Creating multi-step plan ---")
+        
+        try:
+            plan = await self.planner.acreate_plan(state["user_query"])
+        except Exception as e:
+            return self._planning_failed(e)
+        return self._planned(plan)
+    
+    @staticmethod
+    def _planned(plan: MultiStepPlan) -> Dict[str, Any]:
+        return {
+            "plan": plan,
+            "status": "executing",
+            "current_step_index": 0,
+            "error_message": None
+        }
+    
+    @staticmethod
+    def _planning_failed(e: Exception) -> Dict[str, Any]:
+        return {
+            "status": "error",
+            "error_message": f"Planning failed: {str(e)}"
+        }
 
 
-class ExecutorNode:
+class ExecutorNode(_ThreadedNode):
     """
     LangGraph node that handles step execution.
     Mirrors the Executor functionality but works with individual steps.
     """
     
     def __init__(self):
+        from agent.workspace import AgentWorkspace
+        from tools.query_tool import SimpleQueryTool, InformUserTool
         self.simple_query_tool = SimpleQueryTool()
         self.inform_user_tool = InformUserTool()
+        self.action_cache = get_action_cache()
+        
+        # Persistent workspace, kept in sync with state["dataframes"] between steps
+        self._workspace = AgentWorkspace()
+        self._state_version = None
+        self._workspace_sources = {}  # name -> LazyDF entry the cached frame was built from
+        
+        # Concurrent runs share this node (and its workspace), so steps execute one at a time
+        self._lock = threading.Lock()
+        
+        # Tool name -> handler, resolved once
+        self._dispatch = {
+            "data_fetch": self._do_data_fetch,
+            "inform_user": self._do_inform_user,
+            "describe_dataframe": self._do_describe,
+            "get_valid_business_lines": self._do_business_lines,
+            "code_executor": self._do_code,
+        }
+    
+    def _sync_workspace(self, state: AgentState) -> "AgentWorkspace":
+        """
+        Returns the persistent workspace, updated to match the state.
+        Only frames that were added, removed or replaced since the last sync are rebuilt.
+        """
+        if self._state_version is not None and state.get("_df_version") == self._state_version:
+            return self._workspace
+        
+        stored = state["dataframes"]
+        cached = self._workspace.dataframes
+        for name in set(cached) - set(stored):
+            del cached[name]
+            self._workspace_sources.pop(name, None)
+        for name, data in stored.items():
+            if self._workspace_sources.get(name) is not data:
+                cached[name] = WorkspaceManager.get_dataframe(state, name)
+                self._workspace_sources[name] = data
+        
+        self._state_version = state.get("_df_version")
+        return self._workspace
+    
+    @staticmethod
+    def _fingerprints(state: AgentState, workspace: "AgentWorkspace") -> Dict[str, str]:
+        """Fingerprints of the workspace frames, taken from the state where available."""
+        stored = state["dataframes"]
+        return {
+            name: stored[name].fingerprint if name in stored else WorkspaceManager._fingerprint(df)
+            for name, df in workspace.dataframes.items()
+            if isinstance(df, pd.DataFrame)
+        }
+    
+    def _invalidate_workspace(self) -> None:
+        """Forces a full rebuild on the next sync."""
+        self._workspace.dataframes = {}
+        self._workspace_sources = {}
+        self._state_version = None
     
     def __call__(self, state: AgentState) -> Dict[str, Any]:
         """Execute the current step."""
@@ -67,24 +221,27 @@ class ExecutorNode:
         if not state["plan"] or state["current_step_index"] >= len(state["plan"].plan):
             return {"status": "completed"}
         
-        current_step = state["plan"].plan[state["current_step_index"]]
-        summary = f"Step {state['current_step_index'] + 1}: {current_step.summary}"
-        print(f"\n--- {summary} ---")
+        index = state["current_step_index"]
+        steps = self._next_steps(state["plan"].plan, index)
+        summaries = [f"Step {index + i + 1}: {step.summary}" for i, step in enumerate(steps)]
+        for summary in summaries:
+            print(f"\n--- {summary} ---")
         
         try:
-            # Execute the step based on tool type
-            result = self._execute_step(state, current_step)
-            
-            # Update state with results
-            new_summaries = state["summaries"].copy()
-            new_summaries.append(summary)
+            # Execute the step based on tool type; consecutive data fetches run as one batch
+            with self._lock:
+                if len(steps) > 1:
+                    result = self._execute_fetches(state, steps)
+                else:
+                    result = self._execute_step(state, steps[0])
             
+            # Update state with results (the summaries reducer appends to the existing list)
             updates = {
-                "summaries": new_summaries,
-                "current_step_index": state["current_step_index"] + 1,
+                "summaries": summaries,
+                "current_step_index": index + len(steps),
                 "retry_count": 0,
                 "error_message": None,
-                "current_step": current_step
+                "current_step": steps[-1]
             }
             
             # Merge any additional updates from step execution
@@ -111,62 +268,188 @@ class ExecutorNode:
                     "status": "executing"  # Stay in executing state for retry
                 }
     
-    def _execute_step(self, state: AgentState, step: PlanStep) -> Dict[str, Any]:
-        """Execute a single step and return state updates."""
-        tool_name = step.tool_name
-        params = step.parameters
+    @staticmethod
+    def _next_steps(plan: List[PlanStep], index: int) -> List[PlanStep]:
+        """
+        Returns the steps to run next: the current step, plus any data_fetch steps
+        directly following a data_fetch. Fetches only write their own output
+        variable, so a run of them can be executed as one batch.
+        """
+        end = index + 1
+        if plan[index].tool_name == "data_fetch":
+            while end < len(plan) and plan[end].tool_name == "data_fetch":
+                end += 1
+        return plan[index:end]
+    
+    def _execute_fetches(self, state: AgentState, steps: List[PlanStep]) -> Dict[str, Any]:
+        """
+        Execute data_fetch steps as one batch.
+        Results are not cached here: SimpleQueryTool caches them keyed on the resolved
+        dates, so relative descriptions such as 'last 30 days' never return stale data.
+        """
+        from tools.query_tool import SimpleQueryInput
         
-        if tool_name == "data_fetch":
-            # Execute data fetch
-            query_input = SimpleQueryInput(**params.dict(exclude={'output_variable'}))
-            result_df = self.simple_query_tool.execute(query_input)
-            
-            # Add to workspace
-            WorkspaceManager.add_dataframe(state, params.output_variable, result_df)
-            return {}
-            
-        elif tool_name == "inform_user":
-            # Execute inform user
-            tool_input = InformUserInput(**params.dict())
-            message = self.inform_user_tool.execute(tool_input)
-            
-            # This is a terminal step
+        query_inputs = []
+        for step in steps:
+            query_params = step.parameters.cached_dict(exclude=_OUTPUT_VARIABLE)
+            # The parameters were validated when the plan was parsed, so skip re-validation
+            query_inputs.append(SimpleQueryInput.model_construct(
+                **{k: v for k, v in query_params.items() if k in _query_input_keys()}
+            ))
+        
+        if len(query_inputs) == 1:
+            results = [self.simple_query_tool.execute(query_inputs[0])]
+        else:
+            results = self.simple_query_tool.execute_batch(query_inputs)
+        
+        # Add to workspace in plan order, so a repeated output variable keeps the last result
+        outputs = {}
+        for step, result_df in zip(steps, results):
+            outputs[step.parameters.output_variable] = result_df
+        return WorkspaceManager.dataframe_updates(outputs)
+    
+    @staticmethod
+    def _info_result(state: AgentState, message: str) -> Dict[str, Any]:
+        """For the final step of an info-only plan, the tool output is the answer shown to the user."""
+        plan = state["plan"]
+        if plan.skip_synthesis and state["current_step_index"] == len(plan.plan) - 1:
             return {
                 "terminal_message": message,
                 "status": "completed"
             }
-            
-        elif tool_name == "describe_dataframe":
-            # Execute describe dataframe
-            # Create a temporary workspace for the describe function
-            temp_workspace = AgentWorkspace()
-            temp_workspace.dataframes = WorkspaceManager.get_dataframes_for_execution(state)
-            
-            description = describe_dataframe(temp_workspace, params.df_name)
-            print(f"Description of '{params.df_name}':\\n{description}")
-            return {}
-            
-        elif tool_name == "get_valid_business_lines":
-            # Execute get valid business lines
+        return {}
+    
+    def _execute_step(self, state: AgentState, step: PlanStep) -> Dict[str, Any]:
+        """Execute a single step and return state updates."""
+        handler = self._dispatch.get(step.tool_name)
+        if handler is None:
+            raise ValueError(f"Unknown tool_name: {step.tool_name}")
+        return handler(state, step)
+    
+    def _do_data_fetch(self, state: AgentState, step: PlanStep) -> Dict[str, Any]:
+        """Fetch data (cached by the query tool on the query and its resolved dates)."""
+        return self._execute_fetches(state, [step])
+    
+    def _do_inform_user(self, state: AgentState, step: PlanStep) -> Dict[str, Any]:
+        """Send a message to the user."""
+        from tools.query_tool import InformUserInput
+        params = step.parameters
+        tool_input = InformUserInput.model_construct(**params.cached_dict())
+        message = self.inform_user_tool.execute(tool_input)
+        
+        # This is a terminal step
+        return {
+            "terminal_message": message,
+            "status": "completed"
+        }
+    
+    def _do_describe(self, state: AgentState, step: PlanStep) -> Dict[str, Any]:
+        """Describe a workspace dataframe (cached on its fingerprint)."""
+        from tools.code_executor import describe_dataframe
+        params = step.parameters
+        workspace = self._sync_workspace(state)
+        
+        # Cache on the parameters plus the content of the described dataframe
+        fingerprints = self._fingerprints(state, workspace)
+        input_hashes = [fingerprints[params.df_name]] if params.df_name in fingerprints else []
+        key = self.action_cache.make_key("describe_dataframe", params.cached_dict(), input_hashes)
+        hit, description = self.action_cache.get(key)
+        if hit:
+            print(f"--- ActionCache: cache hit for 'describe_dataframe', tokens saved={len(description)} chars ---")
+        else:
+            description = describe_dataframe(workspace, params.df_name)
+            self.action_cache.put(key, description)
+        print(f"Description of '{params.df_name}':\\n{description}")
+        return self._info_result(state, f"Description of '{params.df_name}':\n{description}")
+    
+    def _do_business_lines(self, state: AgentState, step: PlanStep) -> Dict[str, Any]:
+        """Look up the valid business lines (reference data, cached with a TTL)."""
+        from tools.resolvers import get_valid_business_lines
+        key = self.action_cache.make_key("get_valid_business_lines", {})
+        hit, valid_lines = self.action_cache.get(key)
+        if hit:
+            print("--- ActionCache: cache hit for 'get_valid_business_lines' ---")
+        else:
             valid_lines = get_valid_business_lines()
-            print(f"Valid business lines: {valid_lines}")
-            return {}
-            
-        elif tool_name == "code_executor":
-            # Execute code
-            temp_workspace = AgentWorkspace()
-            temp_workspace.dataframes = WorkspaceManager.get_dataframes_for_execution(state)
-            
-            updated_workspace = execute_python_code(temp_workspace, params.code)
+            self.action_cache.put(key, valid_lines, ttl=BUSINESS_LINES_CACHE_TTL)
+        print(f"Valid business lines: {valid_lines}")
+        return self._info_result(state, f"Valid business lines: {valid_lines}")
+    
+    def _do_code(self, state: AgentState, step: PlanStep) -> Dict[str, Any]:
+        """Run generated code against the workspace (cached on the code and its inputs)."""
+        from tools.code_executor import execute_python_code
+        params = step.parameters
+        workspace = self._sync_workspace(state)
+        
+        # Cache on the code plus the content of the frames it reads
+        digests = self._fingerprints(state, workspace)
+        referenced = _referenced_names(params.code)
+        inputs = digests if referenced is None else {n: d for n, d in digests.items() if n in referenced}
+        key = self.action_cache.make_key(
+            "code_executor", {"code": params.code}, [f"{name}:{d}" for name, d in inputs.items()]
+        )
+        
+        after = {}
+        hit, outputs = self.action_cache.get(key)
+        if hit and _plot_files_exist(outputs):
+            print(f"--- ActionCache: cache hit for 'code_executor', frames restored={list(outputs)} ---")
+            changed = {name: df.copy() for name, df in outputs.items()}
+            workspace.dataframes.update(changed)
+        else:
+            before = dict(workspace.dataframes)
+            try:
+                updated_workspace = execute_python_code(workspace, params.code)
+            except Exception:
+                # The code may have mutated cached frames before failing
+                self._invalidate_workspace()
+                raise
             
-            # Update state with new dataframes
+            # Frames the code never touched keep their fingerprint; only frames it
+            # read, replaced or created are rehashed to see whether they changed
             for name, df in updated_workspace.dataframes.items():
-                WorkspaceManager.add_dataframe(state, name, df)
-            
-            return {}
-            
+                untouched = (before.get(name) is df and referenced is not None
+                             and name not in referenced)
+                if isinstance(df, pd.DataFrame) and not untouched:
+                    after[name] = WorkspaceManager._fingerprint(df)
+            changed = {
+                name: df for name, df in updated_workspace.dataframes.items()
+                if not isinstance(df, pd.DataFrame) or (name in after and after[name] != digests.get(name))
+            }
+            if all(isinstance(df, pd.DataFrame) for df in changed.values()):
+                self.action_cache.put(key, {name: df.copy() for name, df in changed.items()})
+        
+        # Return only the changed dataframes (one version bump for the whole batch)
+        updates = WorkspaceManager.dataframe_updates(changed, fingerprints=after)
+        
+        # The workspace already holds these frames, so record their new entries
+        # as the sources instead of rebuilding them on the next sync
+        for name in set(self._workspace_sources) - set(workspace.dataframes):
+            del self._workspace_sources[name]
+        self._workspace_sources.update(updates["dataframes"])
+        if set(self._workspace_sources) == set(state["dataframes"]) | set(changed):
+            self._state_version = updates["_df_version"]
         else:
-            raise ValueError(f"Unknown tool_name: {tool_name}")
+            # The code dropped names that are still in the state; resync next time
+            self._state_version = None
+        
+        return updates
+
+
+# Prompt asking the planner for a corrected plan after a step fails
+_CORRECTION_TMPL = string.Template("""
+The previous plan failed during a step. Your task is to create a new plan to achieve the original user goal.
+
+**Original User Query:** $user_query
+
+**Previous Plan Context:**
+The plan was executing step $step_n, which was: "$step_summary"
+It failed with the error: $error
+
+**Current Workspace State:**
+The following dataframes are available: $dfs
+
+Please create a new, corrected plan to recover from this error and complete the original request.
+""")
 
 
 class ErrorHandlerNode:
@@ -175,55 +458,68 @@ class ErrorHandlerNode:
     """
     
     def __init__(self):
+        from agent.multi_step_planner import MultiStepPlanner
         self.planner = MultiStepPlanner()
     
     def __call__(self, state: AgentState) -> Dict[str, Any]:
         """Handle errors and generate corrected plan."""
         print("--- Requesting a new plan from the planner... ---")
         
-        # Build correction prompt
+        try:
+            # Get new plan
+            new_plan = self.planner.create_plan(self._correction_prompt(state))
+        except Exception as e:
+            return self._correction_failed(e)
+        return self._corrected(state, new_plan)
+    
+    async def ainvoke(self, state: AgentState) -> Dict[str, Any]:
+        """Handle errors without blocking the event loop."""
+        print("--- Requesting a new plan from the planner... ---")
+        
+        try:
+            new_plan = await self.planner.acreate_plan(self._correction_prompt(state))
+        except Exception as e:
+            return self._correction_failed(e)
+        return self._corrected(state, new_plan)
+    
+    @staticmethod
+    def _correction_prompt(state: AgentState) -> str:
         current_step = state.get("current_step")
         step_summary = current_step.summary if current_step else "Unknown step"
         
-        correction_prompt = f"""
-The previous plan failed during a step. Your task is to create a new plan to achieve the original user goal.
-
-**Original User Query:** {state["user_query"]}
-
-**Previous Plan Context:**
-The plan was executing step {state["current_step_index"] + 1}, which was: "{step_summary}"
-It failed with the error: {state["error_message"]}
-
-**Current Workspace State:**
-The following dataframes are available: {WorkspaceManager.list_dataframes(state)}
-
-Please create a new, corrected plan to recover from this error and complete the original request.
-"""
+        return _CORRECTION_TMPL.substitute(
+            user_query=state["user_query"],
+            step_n=state["current_step_index"] + 1,
+            step_summary=step_summary,
+            error=state["error_message"],
+            dfs=WorkspaceManager.list_dataframes(state),
+        )
+    
+    @staticmethod
+    def _corrected(state: AgentState, new_plan: MultiStepPlan) -> Dict[str, Any]:
+        # Replace remaining steps with new plan. Both parts are already validated
+        # (the prefix when it was planned, the new steps by create_plan), so skip re-validation
+        remaining_steps = new_plan.plan
+        corrected_plan = MultiStepPlan.model_construct(
+            plan=state["plan"].plan[:state["current_step_index"]] + remaining_steps,
+            skip_synthesis=new_plan.skip_synthesis
+        )
         
-        try:
-            # Get new plan
-            new_plan = self.planner.create_plan(correction_prompt)
-            
-            # Replace remaining steps with new plan
-            remaining_steps = new_plan.plan
-            corrected_plan = MultiStepPlan(
-                plan=state["plan"].plan[:state["current_step_index"]] + remaining_steps
-            )
-            
-            print("--- Plan has been corrected. Retrying from the current step. ---")
-            
-            return {
-                "plan": corrected_plan,
-                "status": "executing",
-                "retry_count": 0,
-                "error_message": None
-            }
-            
-        except Exception as e:
-            return {
-                "status": "failed",
-                "error_message": f"Plan correction failed: {str(e)}"
-            }
+        print("--- Plan has been corrected. Retrying from the current step. ---")
+        
+        return {
+            "plan": corrected_plan,
+            "status": "executing",
+            "retry_count": 0,
+            "error_message": None
+        }
+    
+    @staticmethod
+    def _correction_failed(e: Exception) -> Dict[str, Any]:
+        return {
+            "status": "failed",
+            "error_message": f"Plan correction failed: {str(e)}"
+        }
 
 
 class ResponseSynthesizerNode:
@@ -232,6 +528,7 @@ class ResponseSynthesizerNode:
     """
     
     def __init__(self):
+        from agent.response_synthesizer import ResponseSynthesizer
         self.synthesizer = ResponseSynthesizer()
     
     def __call__(self, state: AgentState) -> Dict[str, Any]:
@@ -239,55 +536,93 @@ class ResponseSynthesizerNode:
         print("\n--- LangGraph ResponseSynthesizer: Generating final response ---")
         
         try:
-            # Create a temporary workspace for the synthesizer
-            temp_workspace = AgentWorkspace()
-            temp_workspace.dataframes = WorkspaceManager.get_dataframes_for_execution(state)
-            
             # Generate response
-            final_answer = self.synthesizer.synthesize(state["user_query"], temp_workspace)
-            
-            return {
-                "final_response": final_answer,
-                "status": "completed"
-            }
-            
+            final_answer = self.synthesizer.synthesize(state["user_query"], self._workspace(state))
         except Exception as e:
-            return {
-                "status": "error",
-                "error_message": f"Response synthesis failed: {str(e)}"
-            }
+            return self._synthesis_failed(e)
+        return self._synthesized(final_answer)
+    
+    async def ainvoke(self, state: AgentState) -> Dict[str, Any]:
+        """Generate the final response without blocking the event loop."""
+        print("\n--- LangGraph ResponseSynthesizer: Generating final response ---")
+        
+        try:
+            final_answer = await self.synthesizer.asynthesize(state["user_query"], self._workspace(state))
+        except Exception as e:
+            return self._synthesis_failed(e)
+        return self._synthesized(final_answer)
+    
+    @staticmethod
+    def _workspace(state: AgentState) -> "AgentWorkspace":
+        from agent.workspace import AgentWorkspace
+        
+        # Create a temporary workspace for the synthesizer
+        temp_workspace = AgentWorkspace()
+        temp_workspace.dataframes = WorkspaceManager.get_dataframes_for_execution(state)
+        return temp_workspace
+    
+    @staticmethod
+    def _synthesized(final_answer: str) -> Dict[str, Any]:
+        return {
+            "final_response": final_answer,
+            "status": "completed"
+        }
+    
+    @staticmethod
+    def _synthesis_failed(e: Exception) -> Dict[str, Any]:
+        return {
+            "status": "error",
+            "error_message": f"Response synthesis failed: {str(e)}"
+        }
 
 
 # Condition functions for workflow routing
 
-def should_continue_execution(state: AgentState) -> str:
-    """Determine next step in workflow."""
-    status = state["status"]
-    
-    if status == "planning":
-        return "plan"
-    elif status == "executing":
-        # Check if we have more steps
-        if not state["plan"] or state["current_step_index"] >= len(state["plan"].plan):
-            return "synthesize"
-        else:
-            return "execute"
-    elif status == "error":
-        # Check if we've exceeded retries
-        if state["retry_count"] >= state["max_retries"]:
-            return "handle_error"
-        else:
-            return "execute"  # Retry current step
-    elif status == "completed":
-        # Check if we have a terminal message
-        if state.get("terminal_message"):
-            return "end"
-        else:
-            return "synthesize"
-    elif status == "failed":
+def _skips_synthesis(state: AgentState) -> bool:
+    # Info-only plans are answered by their last step (mock plans in tests lack the flag)
+    return getattr(state.get("plan"), "skip_synthesis", False)
+
+
+def _route_executing(state: AgentState) -> str:
+    # Check if we have more steps
+    if not state["plan"] or state["current_step_index"] >= len(state["plan"].plan):
+        return "end" if _skips_synthesis(state) else "synthesize"
+    return "execute"
+
+
+def _route_error(state: AgentState) -> str:
+    # Check if we've exceeded retries, otherwise retry the current step
+    if state["retry_count"] >= state["max_retries"]:
+        return "handle_error"
+    return "execute"
+
+
+def _route_completed(state: AgentState) -> str:
+    # Done once there is a terminal message or a synthesized response
+    if state.get("terminal_message") or state.get("final_response") is not None:
         return "end"
-    else:
+    if _skips_synthesis(state):
         return "end"
+    return "synthesize"
+
+
+def _route_end(state: AgentState) -> str:
+    return "end"
+
+
+# Routing table: status -> function returning the next action
+_ROUTES = {
+    "planning": lambda state: "plan",
+    "executing": _route_executing,
+    "error": _route_error,
+    "completed": _route_completed,
+    "failed": _route_end,
+}
+
+
+def should_continue_execution(state: AgentState) -> str:
+    """Determine next step in workflow."""
+    return _ROUTES.get(state["status"], _route_end)(state)
 
 
 def should_end(state: AgentState) -> bool:
@@ -6,10 +6,68 @@ It mirrors the functionality of AgentWorkspace but is designed for LangGraph's
 state management system.
 """
 
-from typing import Dict, List, Optional, Any, TypedDict
+import itertools
+import operator
+from typing import Annotated, Callable, Dict, List, Optional, Any, TypedDict, Union, get_type_hints
 from pydantic import BaseModel
 import pandas as pd
 from agent.models import MultiStepPlan, PlanStep
+from tools.action_cache import dataframe_digest
+
+
+def _merge_dfs(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer for workspace fields: nodes return only the entries they changed."""
+    out = old.copy()
+    out.update(new)
+    return out
+
+
+class LazyDF:
+    """
+    A workspace dataframe that is built on first use.
+    
+    The state holds these instead of materialized frames, so a frame that is
+    added but never read costs nothing beyond its builder. `materialize` calls
+    the builder once and memoizes the result; the fingerprint is likewise only
+    computed when something asks for it.
+    """
+    __slots__ = ("_builder", "_cache", "_fingerprint")
+    
+    def __init__(self, builder: Callable[[], pd.DataFrame], fingerprint: Optional[str] = None):
+        self._builder = builder
+        self._cache: Optional[pd.DataFrame] = None
+        self._fingerprint = fingerprint
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, fingerprint: Optional[str] = None) -> "LazyDF":
+        """
+        Wraps an already materialized frame.
+        A copy is kept so later in-place edits of `df` cannot alter the stored snapshot.
+        """
+        lazy = cls(None, fingerprint)
+        lazy._cache = df.copy()
+        return lazy
+    
+    def materialize(self) -> pd.DataFrame:
+        """Returns the frame, building it on the first call. Callers must not mutate it."""
+        if self._cache is None:
+            df = self._builder()
+            if not isinstance(df, pd.DataFrame):
+                raise TypeError(f"Builder must return a pandas DataFrame, not {type(df)}")
+            self._cache = df
+            self._builder = None  # Release whatever the builder closed over
+        return self._cache
+    
+    @property
+    def fingerprint(self) -> str:
+        """
+        Content hash of the frame, sensitive to row order, the index, column labels and dtypes.
+        Kept here rather than in df.attrs, because pandas copies attrs onto frames
+        derived from this one, which would then carry a stale fingerprint.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = dataframe_digest(self.materialize())
+        return self._fingerprint
 
 
 class AgentState(TypedDict):
@@ -29,10 +87,13 @@ class AgentState(TypedDict):
     current_step_index: int
     
     # Dataframes storage (mirrors AgentWorkspace.dataframes)
-    dataframes: Dict[str, Any]  # Will store serialized dataframes
+    dataframes: Annotated[Dict[str, LazyDF], _merge_dfs]
+    
+    # Bumped whenever `dataframes` changes, so nodes can tell when their cached copies are stale
+    _df_version: int
     
-    # Execution summaries
-    summaries: List[str]
+    # Execution summaries (nodes return only new summaries; the reducer appends them)
+    summaries: Annotated[List[str], operator.add]
     
     # Current step being executed
     current_step: Optional[PlanStep]
@@ -52,6 +113,35 @@ class AgentState(TypedDict):
     terminal_message: Optional[str]
 
 
+# Versions are drawn from one process-wide counter so that states from different
+# runs never share a version number with a node's cached workspace
+_df_versions = itertools.count(1)
+
+
+# Reducers declared on AgentState via Annotated[..., reducer], keyed by field name
+_REDUCERS = {
+    name: hint.__metadata__[0]
+    for name, hint in get_type_hints(AgentState, include_extras=True).items()
+    if hasattr(hint, "__metadata__")
+}
+
+
+def merge_state(state: AgentState, updates: Dict[str, Any]) -> AgentState:
+    """
+    Merge a node's updates into the state.
+    
+    Mirrors LangGraph's channel semantics: fields annotated with a reducer are
+    combined with the existing value, all other fields are overwritten.
+    """
+    for key, value in updates.items():
+        reducer = _REDUCERS.get(key)
+        if reducer is not None and key in state:
+            state[key] = reducer(state[key], value)
+        else:
+            state[key] = value
+    return state
+
+
 class WorkspaceManager:
     """
     Utility class to manage dataframes in the state.
@@ -61,38 +151,71 @@ class WorkspaceManager:
     """
     
     @staticmethod
-    def add_dataframe(state: AgentState, name: str, df: pd.DataFrame) -> None:
-        """Add a dataframe to the state."""
-        if not isinstance(df, pd.DataFrame):
-            raise TypeError(f"Value must be a pandas DataFrame, not {type(df)}")
-        
-        # Convert DataFrame to dict for serialization
-        state["dataframes"][name] = df.to_dict('records')
-        print(f"--- Workspace: Adding/updating dataframe '{name}' ---")
+    def _fingerprint(df: pd.DataFrame) -> str:
+        """Content hash of a materialized dataframe, computed the same way as LazyDF.fingerprint."""
+        return dataframe_digest(df)
+    
+    @staticmethod
+    def dataframe_updates(frames: Dict[str, Union[pd.DataFrame, Callable[[], pd.DataFrame]]],
+                          fingerprints: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Builds the state update that adds or replaces the given dataframes.
+        Each value is either a DataFrame or a zero-argument builder that is only
+        called when the frame is first read.
+        Only the changed frames are included; the `dataframes` reducer merges them
+        into the workspace, and the version is bumped once for the whole batch.
+        Fingerprints the caller has already computed can be passed in to avoid rehashing.
+        """
+        fingerprints = fingerprints or {}
+        entries = {}
+        for name, df in frames.items():
+            if isinstance(df, pd.DataFrame):
+                entries[name] = LazyDF.from_frame(df, fingerprints.get(name))
+            elif callable(df):
+                entries[name] = LazyDF(df, fingerprints.get(name))
+            else:
+                raise TypeError(f"Value must be a pandas DataFrame or a builder, not {type(df)}")
+            print(f"--- Workspace: Adding/updating dataframe '{name}' ---")
+        return {
+            "dataframes": entries,
+            "_df_version": next(_df_versions),
+        }
+    
+    @staticmethod
+    def add_dataframe(state: AgentState, name: str,
+                      df: Union[pd.DataFrame, Callable[[], pd.DataFrame]]) -> None:
+        """Add a dataframe, or a builder for one, to the state."""
+        WorkspaceManager.add_dataframes(state, {name: df})
+    
+    @staticmethod
+    def add_dataframes(state: AgentState, frames: Dict[str, Union[pd.DataFrame, Callable[[], pd.DataFrame]]],
+                       fingerprints: Optional[Dict[str, str]] = None) -> None:
+        """Add several dataframes to the state, bumping the version only once."""
+        merge_state(state, WorkspaceManager.dataframe_updates(frames, fingerprints))
     
     @staticmethod
     def get_dataframe(state: AgentState, name: str) -> pd.DataFrame:
-        """Get a dataframe from the state."""
+        """Get a dataframe from the state, materializing it if needed."""
         if name not in state["dataframes"]:
             raise KeyError(f"DataFrame '{name}' not found in workspace.")
         
-        # Convert back to DataFrame
-        return pd.DataFrame(state["dataframes"][name])
+        # Hand out a copy so callers cannot mutate the stored snapshot
+        return state["dataframes"][name].materialize().copy()
     
     @staticmethod
     def list_dataframes(state: AgentState) -> Dict[str, str]:
         """List all dataframes in the state."""
         return {
-            name: str(pd.DataFrame(data).columns.tolist()) 
-            for name, data in state["dataframes"].items()
+            name: str(list(lazy.materialize().columns))
+            for name, lazy in state["dataframes"].items()
         }
     
     @staticmethod
     def get_dataframes_for_execution(state: AgentState) -> Dict[str, pd.DataFrame]:
         """Get all dataframes as pandas DataFrames for code execution."""
         return {
-            name: pd.DataFrame(data) 
-            for name, data in state["dataframes"].items()
+            name: WorkspaceManager.get_dataframe(state, name)
+            for name in state["dataframes"]
         }
 
 
@@ -103,6 +226,7 @@ def create_initial_state(user_query: str) -> AgentState:
         plan=None,
         current_step_index=0,
         dataframes={},
+        _df_version=next(_df_versions),
         summaries=[],
         current_step=None,
         error_message=None,
@@ -5,20 +5,36 @@ This module defines the LangGraph workflow that mirrors the original AgentCP
 execution flow using a graph-based approach.
 """
 
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
+import logging
+from dataclasses import dataclass
 
-from typing import Dict, Any
-from .state import AgentState, create_initial_state
+from typing import Any, Callable, Dict, List, Optional
+from .state import AgentState, create_initial_state, merge_state
 from .nodes import (
     PlannerNode, 
     ExecutorNode, 
     ErrorHandlerNode, 
     ResponseSynthesizerNode,
-    should_continue_execution,
-    should_end
+    should_continue_execution
 )
+from agent.config import MAX_WORKFLOW_TRANSITIONS, PLANNER_CACHE_TTL
+from agent.llm_client import close_async_llm_client
+from tools.action_cache import ActionCache
+
+logger = logging.getLogger(__name__)
+
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Mirrors langgraph.types.CachePolicy: a node's result is reused while its
+    key is unchanged and the entry is younger than `ttl` seconds.
+    """
+    key_func: Callable[[AgentState], Any]
+    ttl: Optional[float] = None
+
 
 # Since we can't install LangGraph in this environment, let's create a 
 # simplified workflow class that demonstrates the intended structure
@@ -38,65 +54,115 @@ class SimplifiedLangGraphWorkflow:
         self.error_handler_node = ErrorHandlerNode()
         self.response_synthesizer_node = ResponseSynthesizerNode()
         
+        # Routing action -> node, resolved once instead of per iteration
+        self._dispatch = {
+            "plan": self.planner_node,
+            "execute": self.executor_node,
+            "handle_error": self.error_handler_node,
+            "synthesize": self.response_synthesizer_node,
+        }
+        
+        # Node-level caching (the equivalent of compile(cache=InMemoryCache())).
+        # Planning is deterministic enough per query to reuse; the other nodes depend on live data.
+        self._cache = ActionCache(cache_dir=None)
+        self._cache_policies = {
+            "plan": CachePolicy(
+                key_func=lambda s: (s["status"], s.get("current_step_index"), s["user_query"]),
+                ttl=PLANNER_CACHE_TTL,
+            ),
+        }
+        
         print("--- LangGraph Workflow initialized ---")
     
-    def run(self, user_query: str) -> Dict[str, Any]:
+    async def arun(self, user_query: str) -> Dict[str, Any]:
         """
         Run the workflow with the given user query.
         
-        This simulates the LangGraph execution flow.
+        Each node's result drives the next transition directly; the workflow
+        awaits the nodes, so several runs can share one event loop.
         """
         # Create initial state
         state = create_initial_state(user_query)
         
         print(f"\\n--- Starting LangGraph workflow for query: {user_query} ---")
         
-        # Main execution loop
-        max_iterations = 50  # Prevent infinite loops
-        iteration = 0
+        transitions = 0
+        next_action = should_continue_execution(state)
+        # Node cache entries this run read or wrote; dropped again if the run fails
+        cached_keys: List[str] = []
+        handled_error = False
         
-        while iteration < max_iterations:
-            iteration += 1
-            print(f"\\n--- Workflow Iteration {iteration} ---")
-            print(f"Current status: {state['status']}")
-            
-            # Determine next action
-            next_action = should_continue_execution(state)
-            print(f"Next action: {next_action}")
-            
-            if next_action == "plan":
-                # Execute planner node
-                updates = self.planner_node(state)
-                state.update(updates)
-                
-            elif next_action == "execute":
-                # Execute current step
-                updates = self.executor_node(state)
-                state.update(updates)
-                
-            elif next_action == "handle_error":
-                # Handle error and correct plan
-                updates = self.error_handler_node(state)
-                state.update(updates)
-                
-            elif next_action == "synthesize":
-                # Generate final response
-                updates = self.response_synthesizer_node(state)
-                state.update(updates)
-                
-            elif next_action == "end":
+        while next_action != "end":
+            if transitions >= MAX_WORKFLOW_TRANSITIONS:
+                print(f"--- Workflow stopped after {transitions} transitions without reaching an end state ---")
                 break
-                
-            else:
+            
+            node = self._dispatch.get(next_action)
+            if node is None:
                 print(f"Unknown action: {next_action}")
                 break
             
-            # Check if we should end
-            if should_end(state):
-                break
+            handled_error = handled_error or next_action == "handle_error"
+            merge_state(state, await self._invoke(next_action, node, state, cached_keys))
+            transitions += 1
+            
+            next_action = should_continue_execution(state)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Workflow transition %d: status=%s, next action=%s",
+                             transitions, state["status"], next_action)
         
-        print(f"\\n--- LangGraph workflow completed after {iteration} iterations ---")
+        # A plan that failed during execution would fail again for the next identical
+        # query, so it must not be replayed from the cache
+        if handled_error or state["status"] in ("error", "failed"):
+            for key in cached_keys:
+                self._cache.invalidate(key)
+        
+        print(f"\\n--- LangGraph workflow completed after {transitions} transitions ---")
         return state
+    
+    async def _invoke(self, action: str, node: Any, state: AgentState, cached_keys: List[str]) -> Dict[str, Any]:
+        """
+        Runs a node, serving its result from the node cache when it has a cache policy.
+        The keys of cache entries used or stored are appended to `cached_keys`.
+        """
+        policy = self._cache_policies.get(action)
+        if policy is None:
+            return await node.ainvoke(state)
+        
+        key = self._cache.make_key(action, policy.key_func(state))
+        hit, updates = self._cache.get(key)
+        if hit:
+            print(f"--- Workflow cache hit for node '{action}' ---")
+            cached_keys.append(key)
+            return dict(updates)
+        
+        updates = await node.ainvoke(state)
+        # Failures are not cached, so the next run retries them
+        if updates.get("status") != "error":
+            self._cache.put(key, dict(updates), ttl=policy.ttl)
+            cached_keys.append(key)
+        return updates
+    
+    def run(self, user_query: str) -> Dict[str, Any]:
+        """
+        Synchronous entry point for callers that are not running an event loop.
+        Code that is already inside a loop (Jupyter, async web handlers) must await arun() instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._run_and_close(user_query))
+        raise RuntimeError(
+            "SimplifiedLangGraphWorkflow.run() cannot be called from a running event loop; "
+            "use 'await workflow.arun(user_query)' instead."
+        )
+    
+    async def _run_and_close(self, user_query: str) -> Dict[str, Any]:
+        """Runs the workflow on a loop owned by run(), closing that loop's LLM client afterwards."""
+        try:
+            return await self.arun(user_query)
+        finally:
+            await close_async_llm_client()
 
 
 # This is how the actual LangGraph workflow would be defined:
@@ -1,12 +1,19 @@
+import re
 import pandas as pd
+import pytest
+from unittest.mock import patch
+import tools.query_tool as query_tool
 from tools.query_tool import SimpleQueryTool, SimpleQueryInput
 
-def run_query_tool_tests():
+@pytest.fixture(scope="module")
+def tool():
+    """One SimpleQueryTool shared by every test in this module."""
+    return SimpleQueryTool()
+
+def run_query_tool_tests(tool):
     """Test the SimpleQueryTool with various query inputs."""
     print("--- Running Query Tool Tests ---")
     
-    tool = SimpleQueryTool()
-    
     # Test Case 1: Basic aggregate query
     print("\n--- Test Case 1: Aggregate Revenues for a single client ---")
     query1 = SimpleQueryInput(
@@ -71,9 +78,8 @@ def run_query_tool_tests():
     
     print("\n--- All Query Tool Tests Passed ---")
 
-def test_basic_revenues_query():
+def test_basic_revenues_query(tool):
     """Test basic revenue query with default aggregate granularity."""
-    tool = SimpleQueryTool()
     query_input = SimpleQueryInput(
         metric="revenues",
         entities=["millennium", "systematic"],
@@ -84,9 +90,8 @@ def test_basic_revenues_query():
     assert not result.empty
     assert "revenues" in result.columns
 
-def test_multi_dimensional_row_granularity():
+def test_multi_dimensional_row_granularity(tool):
     """Test multi-dimensional row granularity with date and client."""
-    tool = SimpleQueryTool()
     query_input = SimpleQueryInput(
         metric="revenues", 
         entities=["millennium", "systematic"],
@@ -101,9 +106,8 @@ def test_multi_dimensional_row_granularity():
     # Should have multiple rows for different date/client combinations
     assert len(result) > 1
 
-def test_business_date_granularity():
+def test_business_date_granularity(tool):
     """Test business and date multi-dimensional granularity."""
-    tool = SimpleQueryTool()
     query_input = SimpleQueryInput(
         metric="balances",
         entities=["millennium"],
@@ -117,9 +121,8 @@ def test_business_date_granularity():
     assert "business" in result.columns
     assert "date" in result.columns
 
-def test_enhanced_granularity_with_columns():
+def test_enhanced_granularity_with_columns(tool):
     """Test enhanced granularity with both row and column dimensions."""
-    tool = SimpleQueryTool()
     query_input = SimpleQueryInput(
         metric="revenues",
         entities=["millennium", "systematic"],
@@ -131,9 +134,8 @@ def test_enhanced_granularity_with_columns():
     assert not result.empty
     # Should have client_id column and business-based columns
 
-def test_balance_decomposition_multi_dimensional():
+def test_balance_decomposition_multi_dimensional(tool):
     """Test balance decomposition with multi-dimensional row granularity."""
-    tool = SimpleQueryTool()
     query_input = SimpleQueryInput(
         metric="balances_decomposition",
         entities=["millennium"],
@@ -145,49 +147,29 @@ def test_balance_decomposition_multi_dimensional():
     assert "date" in result.columns
     assert "client_id" in result.columns
 
-def test_granularity_validation_no_duplicates():
-    """Test that duplicate values in row_granularity are rejected."""
-    try:
-        SimpleQueryInput(
-            metric="revenues",
-            entities=["millennium"],
-            date_description="Q1 2024",
-            row_granularity=["client", "client"]  # Duplicate values
-        )
-        raise AssertionError("Should have raised ValueError for duplicate values")
-    except ValueError as e:
-        assert "row_granularity cannot contain duplicate values" in str(e)
+GRANULARITY_VALIDATION_CASES = [
+    pytest.param(["client", "client"], None,
+                 "row_granularity cannot contain duplicate values", id="no_duplicates"),
+    pytest.param(["aggregate", "client"], None,
+                 "When 'aggregate' is used in row_granularity, it must be the only value", id="aggregate_only"),
+    pytest.param(["client", "business"], ["business", "region"],
+                 "col_granularity cannot contain values that are already in row_granularity", id="no_overlap"),
+]
 
-def test_granularity_validation_aggregate_only():
-    """Test that aggregate must be the only value if used."""
-    try:
+@pytest.mark.parametrize("row_gran,col_gran,msg", GRANULARITY_VALIDATION_CASES)
+def test_validation_rejects(row_gran, col_gran, msg):
+    """Test that invalid row/col granularity combinations are rejected."""
+    with pytest.raises(ValueError, match=re.escape(msg)):
         SimpleQueryInput(
             metric="revenues",
             entities=["millennium"],
             date_description="Q1 2024",
-            row_granularity=["aggregate", "client"]  # Aggregate with other values
+            row_granularity=row_gran,
+            col_granularity=col_gran
         )
-        raise AssertionError("Should have raised ValueError for aggregate with other values")
-    except ValueError as e:
-        assert "When 'aggregate' is used in row_granularity, it must be the only value" in str(e)
 
-def test_granularity_validation_no_overlap():
-    """Test that row_granularity and col_granularity cannot overlap."""
-    try:
-        SimpleQueryInput(
-            metric="revenues",
-            entities=["millennium"],
-            date_description="Q1 2024", 
-            row_granularity=["client", "business"],
-            col_granularity=["business", "region"]  # 'business' overlaps
-        )
-        raise AssertionError("Should have raised ValueError for overlapping granularities")
-    except ValueError as e:
-        assert "col_granularity cannot contain values that are already in row_granularity" in str(e)
-
-def test_capital_metrics():
+def test_capital_metrics(tool):
     """Test capital metrics with multi-dimensional granularity."""
-    tool = SimpleQueryTool()
     query_input = SimpleQueryInput(
         metric="Total AE",
         entities=["millennium"],
@@ -201,9 +183,8 @@ def test_capital_metrics():
     assert "business" in result.columns
     assert "subbusiness" in result.columns
 
-def test_single_dimension_compatibility():
+def test_single_dimension_compatibility(tool):
     """Test that single dimension granularity still works (backward compatibility)."""
-    tool = SimpleQueryTool()
     query_input = SimpleQueryInput(
         metric="balances",
         entities=["millennium"],
@@ -215,35 +196,55 @@ def test_single_dimension_compatibility():
     assert "balances" in result.columns
     assert "client_id" in result.columns
 
+def test_query_tool_cache_hits(tool):
+    """Test that a repeated query is answered from the tool cache without re-resolving."""
+    query_input = SimpleQueryInput(
+        metric="balances",
+        entities=["citadel"],
+        date_description="Q2 2024",
+        row_granularity=["date"]
+    )
+    with patch("tools.query_tool.resolve_clients", wraps=query_tool.resolve_clients) as mock_resolve:
+        first = tool.execute(query_input)
+        second = tool.execute(query_input)
+    assert mock_resolve.call_count == 1, f"Expected 1 resolver call, got {mock_resolve.call_count}"
+    pd.testing.assert_frame_equal(first, second)
+    
+    # Callers get copies, so mutating a result does not affect the cache
+    first["balances"] = 0
+    assert not tool.execute(query_input)["balances"].eq(0).all()
+
+def test_filtered_categories_are_dropped(tool):
+    """Test that values removed by a filter do not linger as categories in the result."""
+    query_input = SimpleQueryInput(
+        metric="revenues",
+        entities=["citadel"],
+        date_description="Q1 2024",
+        business="FICC",
+        row_granularity=["business", "region"]
+    )
+    result_df = tool.execute(query_input)
+    assert list(result_df["business"].cat.categories) == ["FICC"]
+    assert result_df.groupby("business", observed=False)["revenues"].sum().index.tolist() == ["FICC"]
+
 if __name__ == "__main__":
-    run_query_tool_tests()
+    tool = SimpleQueryTool()
+    run_query_tool_tests(tool)
     print("Running multi-dimensional granularity tests...")
-    test_basic_revenues_query()
-    test_multi_dimensional_row_granularity()
-    test_business_date_granularity()
-    test_enhanced_granularity_with_columns()
-    test_balance_decomposition_multi_dimensional()
-    test_capital_metrics()
-    test_single_dimension_compatibility()
+    test_basic_revenues_query(tool)
+    test_multi_dimensional_row_granularity(tool)
+    test_business_date_granularity(tool)
+    test_enhanced_granularity_with_columns(tool)
+    test_balance_decomposition_multi_dimensional(tool)
+    test_capital_metrics(tool)
+    test_single_dimension_compatibility(tool)
+    test_query_tool_cache_hits(tool)
+    test_filtered_categories_are_dropped(tool)
     print("All basic tests passed!")
     
     # Validation tests
-    try:
-        test_granularity_validation_no_duplicates()
-        print("ERROR: Should have failed on duplicate validation")
-    except Exception:
-        print("✓ Duplicate validation works correctly")
-    
-    try:
-        test_granularity_validation_aggregate_only()
-        print("ERROR: Should have failed on aggregate validation")
-    except Exception:
-        print("✓ Aggregate validation works correctly")
-    
-    try:
-        test_granularity_validation_no_overlap()
-        print("ERROR: Should have failed on overlap validation")
-    except Exception:
-        print("✓ Overlap validation works correctly")
+    for case in GRANULARITY_VALIDATION_CASES:
+        test_validation_rejects(*case.values)
+        print(f"✓ {case.id} validation works correctly")
     
     print("All multi-dimensional granularity tests completed successfully!") 
\ No newline at end of file
@@ -1,50 +1,103 @@
-from tools.resolvers import resolve_clients, resolve_dates
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+import tools.resolvers as resolvers
+from tools.resolvers import resolve_clients, resolve_dates, resolve_dates_batch
 from datetime import datetime
 
+current_year = datetime.now().year
+last_year = current_year - 1
+
+CLIENT_CASES = [
+    pytest.param(["millennium"], ["cl_id_millennium"], id="Simple lookup"),
+    pytest.param(["pont 72"], ["cl_id_point72"], id="Typo handling"),
+    pytest.param(["systematic"], ["cl_id_twosigma", "cl_id_citadel", "cl_id_some_other_quant"], id="Group expansion"),
+    pytest.param(["Citadel", "quant"], ["cl_id_citadel", "cl_id_twosigma", "cl_id_some_other_quant"], id="Mixed list"),
+    pytest.param(["Citadel", "systematic"], ["cl_id_citadel", "cl_id_twosigma", "cl_id_some_other_quant"], id="Deduplication"),
+    pytest.param(["not_a_real_client"], [], id="Unknown entity"),
+]
+
+DATE_CASES = [
+    pytest.param("q1 2024", ("2024-01-01", "2024-03-31"), id="Simple Quarter"),
+    pytest.param("qtr 2 2024", ("2024-04-01", "2024-06-30"), id="Quarter with 'qtr'"),
+    pytest.param("fy'25", ("2024-10-01", "2025-09-30"), id="Fiscal Year"),
+    pytest.param("2023", ("2023-01-01", "2023-12-31"), id="Simple Year"),
+    pytest.param("last year", (f"{last_year}-01-01", f"{last_year}-12-31"), id="Relative Year"),
+]
+
+@pytest.mark.parametrize("inputs,expected", CLIENT_CASES)
+def test_resolve_client(inputs, expected):
+    result = resolve_clients(inputs)
+    # Order-independent comparison; the length check keeps duplicates from slipping through
+    assert set(result) == set(expected), f"Expected {expected}, got {result}"
+    assert len(result) == len(set(result)), f"Duplicate IDs in {result}"
+
+@pytest.mark.parametrize("inputs,expected", DATE_CASES)
+def test_resolve_dates(inputs, expected):
+    result = resolve_dates(inputs)
+    assert result == expected, f"Expected {expected}, got {result}"
+
+def test_resolve_dates_memoized():
+    # Repeated descriptions are served from the memo cache
+    resolve_dates("q1 2024")
+    hits = resolvers._resolve_dates_cached.cache_info().hits
+    assert resolve_dates("q1 2024") == ("2024-01-01", "2024-03-31")
+    cache_info = resolvers._resolve_dates_cached.cache_info()
+    assert cache_info.hits == hits + 1, f"Expected a cache hit, got {cache_info}"
+
+def test_llm_date_ranges_matched_by_position():
+    # The batch answer is aligned with the descriptions by position, not by echoed text
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices[0].message.content = json.dumps({"ranges": [
+        {"start_date": "2023-12-01", "end_date": "2024-01-05"},
+        {"start_date": "2024-03-15", "end_date": "2024-04-15"},
+    ]})
+    with patch.object(resolvers, "get_llm_client", return_value=client):
+        ranges = resolvers._get_llm_date_ranges(["The Holiday Season", "tax  season"])
+    assert ranges == {
+        "The Holiday Season": ("2023-12-01", "2024-01-05"),
+        "tax  season": ("2024-03-15", "2024-04-15"),
+    }
+
+def test_resolve_dates_batch_falls_back_per_description():
+    # Descriptions the batch could not parse get their own LLM parse, and batch results are reused
+    resolvers._llm_date_ranges.clear()
+    resolvers._resolve_dates_cached.cache_clear()
+    batch_ranges = {"holiday season": ("2023-12-01", "2024-01-05")}
+    with patch.object(resolvers, "_get_llm_date_ranges", return_value=batch_ranges) as mock_batch, \
+         patch.object(resolvers, "_get_llm_date_range", return_value=("2024-03-15", "2024-04-15")) as mock_single:
+        result = resolve_dates_batch(["holiday season", "tax season", "q1 2024"])
+        assert resolve_dates("holiday season") == ("2023-12-01", "2024-01-05")
+    assert result == {
+        "holiday season": ("2023-12-01", "2024-01-05"),
+        "tax season": ("2024-03-15", "2024-04-15"),
+        "q1 2024": ("2024-01-01", "2024-03-31"),
+    }
+    assert mock_batch.call_count == 1
+    mock_single.assert_called_once_with("tax season")
+
 def run_resolver_tests():
     """
     Runs a series of tests on the resolver functions to ensure they work as expected.
     """
     print("--- Running Resolver Tests ---")
 
-    # Test cases for client resolver
     print("\n--- Testing resolve_clients ---")
-    test_cases_clients = {
-        "Simple lookup": (["millennium"], ["cl_id_millennium"]),
-        "Typo handling": (["pont 72"], ["cl_id_point72"]),
-        "Group expansion": (["systematic"], ["cl_id_twosigma", "cl_id_citadel", "cl_id_some_other_quant"]),
-        "Mixed list": (["Citadel", "quant"], ["cl_id_citadel", "cl_id_twosigma", "cl_id_some_other_quant"]),
-        "Deduplication": (["Citadel", "systematic"], ["cl_id_citadel", "cl_id_twosigma", "cl_id_some_other_quant"]),
-        "Unknown entity": (["not_a_real_client"], []),
-    }
-
-    for name, (inputs, expected) in test_cases_clients.items():
-        # Sort lists to ensure comparison is order-independent
-        result = sorted(resolve_clients(inputs))
-        expected = sorted(expected)
-        assert result == expected, f"'{name}' FAILED: Expected {expected}, got {result}"
-        print(f"'{name}' PASSED")
+    for case in CLIENT_CASES:
+        test_resolve_client(*case.values)
+        print(f"'{case.id}' PASSED")
 
-    # Test cases for date resolver
     print("\n--- Testing resolve_dates ---")
-    
-    current_year = datetime.now().year
-    last_year = current_year - 1
-    
-    test_cases_dates = {
-        "Simple Quarter": ("q1 2024", ("2024-01-01", "2024-03-31")),
-        "Quarter with 'qtr'": ("qtr 2 2024", ("2024-04-01", "2024-06-30")),
-        "Fiscal Year": ("fy'25", ("2024-10-01", "2025-09-30")),
-        "Simple Year": ("2023", ("2023-01-01", "2023-12-31")),
-        "Relative Year": ("last year", (f"{last_year}-01-01", f"{last_year}-12-31")),
-    }
-    
-    for name, (inputs, expected) in test_cases_dates.items():
-        result = resolve_dates(inputs)
-        assert result == expected, f"'{name}' FAILED: Expected {expected}, got {result}"
-        print(f"'{name}' PASSED")
+    for case in DATE_CASES:
+        test_resolve_dates(*case.values)
+        print(f"'{case.id}' PASSED")
+    test_resolve_dates_memoized()
+    print("'Memoization' PASSED")
+    test_llm_date_ranges_matched_by_position()
+    test_resolve_dates_batch_falls_back_per_description()
+    print("'Batch date parsing' PASSED")
 
     print("\n--- All Resolver Tests Passed ---")
 
 if __name__ == "__main__":
-    run_resolver_tests() 
\ No newline at end of file
+    run_resolver_tests()
@@ -1,19 +1,32 @@
 import unittest
+from functools import lru_cache
 import pandas as pd
 from unittest.mock import patch
 from agent.response_synthesizer import ResponseSynthesizer
 from agent.workspace import AgentWorkspace
 
+@lru_cache(maxsize=None)
+def _plot_df() -> pd.DataFrame:
+    """Dataframe with a plot path, built once. The synthesizer only reads it."""
+    return pd.DataFrame([{'plot_path': '/static/plots/test.png'}])
+
 class TestResponseSynthesizer(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        # Patch the LLM call once for the whole class rather than per test
+        patcher = patch('openai.resources.chat.completions.Completions.create')
+        cls.mock_create = patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        cls.synthesizer = ResponseSynthesizer()
+
     def setUp(self):
-        self.synthesizer = ResponseSynthesizer()
+        self.mock_create.reset_mock()
         self.workspace = AgentWorkspace()
 
-    @patch('openai.resources.chat.completions.Completions.create')
-    def test_synthesize_table(self, mock_create):
+    def test_synthesize_table(self):
         # Mock the LLM response
-        mock_create.return_value.choices[0].message.content = "This is a test table."
+        self.mock_create.return_value.choices[0].message.content = "This is a test table."
         
         # Create a sample dataframe
         df = pd.DataFrame({'client_name': ['A', 'B'], 'revenue': [100, 200]})
@@ -23,41 +36,75 @@ class TestResponseSynthesizer(unittest.TestCase):
         result = self.synthesizer.synthesize("Show revenues", self.workspace)
         
         # Get the prompt passed to the LLM
-        sent_prompt = mock_create.call_args[1]['messages'][1]['content']
+        sent_prompt = self.mock_create.call_args[1]['messages'][1]['content']
         
         self.assertIn("client_name", sent_prompt)
         self.assertIn("revenue", sent_prompt)
         self.assertEqual(result, "This is a test table.")
 
-    @patch('openai.resources.chat.completions.Completions.create')
-    def test_synthesize_plot(self, mock_create):
+    def test_synthesize_plot(self):
         # Mock the LLM response
-        mock_create.return_value.choices[0].message.content = "This is a test plot."
+        self.mock_create.return_value.choices[0].message.content = "This is a test plot."
         
         # Create a dataframe with a plot path
-        df = pd.DataFrame([{'plot_path': '/static/plots/test.png'}])
-        self.workspace.add_df("plot_df", df)
+        self.workspace.add_df("plot_df", _plot_df())
         
         result = self.synthesizer.synthesize("Plot revenues", self.workspace)
-        sent_prompt = mock_create.call_args[1]['messages'][1]['content']
+        sent_prompt = self.mock_create.call_args[1]['messages'][1]['content']
         
         self.assertIn('<img src="/static/plots/test.png" alt="Financial Plot" style="max-width: 800px; width: 100%; height: auto;">', sent_prompt)
         self.assertEqual(result, "This is a test plot.")
 
-    @patch('openai.resources.chat.completions.Completions.create')
-    def test_synthesize_client_links(self, mock_create):
+    def test_synthesize_client_links(self):
         # Mock the LLM response
-        mock_create.return_value.choices[0].message.content = "This is a test with client links."
+        self.mock_create.return_value.choices[0].message.content = "This is a test with client links."
         
         # Create a dataframe with client info
         df = pd.DataFrame({'client_name': ['Test Client'], 'client_id': ['test_id']})
         self.workspace.add_df("client_df", df)
         
         result = self.synthesizer.synthesize("Show client info", self.workspace)
-        sent_prompt = mock_create.call_args[1]['messages'][1]['content']
+        sent_prompt = self.mock_create.call_args[1]['messages'][1]['content']
         
         self.assertIn("[Test Client](https://my-internal-platform.com/clients/test_id)", sent_prompt)
         self.assertEqual(result, "This is a test with client links.")
 
+    def test_synthesize_client_links_large(self):
+        self.mock_create.return_value.choices[0].message.content = "Many clients."
+        
+        # Links for a large frame are rendered column-wise in one pass
+        n = 10_000
+        df = pd.DataFrame({
+            'client_name': [f"Client {i}" for i in range(n)],
+            'client_id': [f"id_{i}" for i in range(n)],
+        })
+        self.workspace.add_df("clients_df", df)
+        
+        self.synthesizer.synthesize("List all clients", self.workspace)
+        sent_prompt = self.mock_create.call_args[1]['messages'][1]['content']
+        
+        self.assertIn("[Client 0](https://my-internal-platform.com/clients/id_0)", sent_prompt)
+        self.assertIn(f"[Client {n - 1}](https://my-internal-platform.com/clients/id_{n - 1})", sent_prompt)
+        self.assertEqual(sent_prompt.count("](https://my-internal-platform.com/clients/id_"), n)
+    
+    def test_synthesize_client_links_deduplicated(self):
+        self.mock_create.return_value.choices[0].message.content = "Time series."
+        
+        # A long-format time series repeats each client on every row, but gets one link per client
+        df = pd.DataFrame({
+            'date': pd.date_range("2024-01-01", periods=90).repeat(2),
+            'client_name': ["Two Sigma", "Millennium"] * 90,
+            'client_id': ["cl_id_two_sigma", "cl_id_millennium"] * 90,
+            'plot_path': "static/plots/ts.png",
+        })
+        self.workspace.add_df("ts_df", df)
+        
+        self.synthesizer.synthesize("Plot revenues", self.workspace)
+        sent_prompt = self.mock_create.call_args[1]['messages'][1]['content']
+        
+        self.assertEqual(sent_prompt.count("[Two Sigma](https://my-internal-platform.com/clients/cl_id_two_sigma)"), 1)
+        self.assertEqual(sent_prompt.count("[Millennium](https://my-internal-platform.com/clients/cl_id_millennium)"), 1)
+        self.assertEqual(sent_prompt.count('src="/static/plots/ts.png"'), 1)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Action-level cache for deterministic tool outputs.
+
+Tools such as `describe_dataframe`, `get_valid_business_lines` and `code_executor`
+return the same output for the same parameters and the same input dataframes.
+This cache lets the executor skip re-running them, e.g. when a step is retried
+or when a recurring query is asked again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from agent.config import ACTION_CACHE_DIR, ACTION_CACHE_SIZE
+
+
+def canonical_json(params: Any) -> str:
+    """Serializes tool parameters into a stable JSON string (sorted keys, no whitespace)."""
+    return json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def dataframe_digest(df: pd.DataFrame, index: bool = True) -> str:
+    """
+    Returns a content hash of a dataframe.
+    Column labels and dtypes are included so that renamed or re-typed frames hash differently.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(df.columns)).encode())
+    h.update(repr(df.dtypes.astype(str).tolist()).encode())
+    h.update(pd.util.hash_pandas_object(df, index=index).values.tobytes())
+    return h.hexdigest()
+
+
+class ActionCache:
+    """
+    An LRU cache of tool outputs keyed by a content hash of the action.
+    Entries can optionally be persisted to `cache_dir` so they survive restarts:
+    JSON-serializable values are written as JSON and dicts of dataframes as
+    parquet files. Anything else is kept in memory only.
+    The cache is shared between workflow runs, which may execute in worker threads,
+    so all access goes through a lock.
+    """
+    def __init__(self, maxsize: int = ACTION_CACHE_SIZE, cache_dir: Optional[str] = ACTION_CACHE_DIR):
+        self.maxsize = maxsize
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.RLock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(tool_name: str, params: Any, input_hashes: Iterable[str] = ()) -> str:
+        """Builds the cache key from the tool name, its parameters and the hashes of its input dataframes."""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(tool_name.encode())
+        h.update(b"\x00")
+        h.update(canonical_json(params).encode())
+        for input_hash in sorted(input_hashes):
+            h.update(b"\x00")
+            h.update(input_hash.encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (hit, value). Expired entries are treated as misses."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.cache_dir:
+                entry = self._load(key)
+                if entry is not None:
+                    self._insert(key, entry)
+            if entry is None:
+                return False, None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                self.invalidate(key)
+                return False, None
+
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Stores a value, evicting the least recently used entry if the cache is full."""
+        with self._lock:
+            entry = (value, time.time() + ttl if ttl is not None else None)
+            self._insert(key, entry)
+            if self.cache_dir:
+                self._store(key, entry)
+
+    def invalidate(self, key: str) -> None:
+        """Removes a single entry from memory and disk."""
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.cache_dir:
+                self._remove_files(key)
+
+    def clear(self) -> None:
+        """Removes all in-memory entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _insert(self, key: str, entry: Tuple[Any, Optional[float]]) -> None:
+        """Adds an entry as the most recently used one, evicting the oldest entries beyond `maxsize`."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str, suffix: str = ".json") -> str:
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def _frame_path(self, key: str, name: str) -> str:
+        # Frame names come from generated code, so they are hashed rather than used as file names
+        return self._path(key, f".{hashlib.blake2b(name.encode(), digest_size=8).hexdigest()}.parquet")
+
+    def _load(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            if record["kind"] == "frames":
+                value = {name: pd.read_parquet(self._frame_path(key, name)) for name in record["value"]}
+            else:
+                value = record["value"]
+            return value, record["expires_at"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError, ImportError) as e:
+            print(f"--- ActionCache: ignoring unreadable disk entry {key}: {e} ---")
+            return None
+
+    def _store(self, key: str, entry: Tuple[Any, Optional[float]]) -> None:
+        value, expires_at = entry
+        try:
+            if isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+                frames: Dict[str, pd.DataFrame] = value
+                for name, df in frames.items():
+                    df.to_parquet(self._frame_path(key, name))
+                record = {"kind": "frames", "value": list(frames), "expires_at": expires_at}
+            else:
+                record = {"kind": "json", "value": value, "expires_at": expires_at}
+            payload = json.dumps(record)
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                f.write(payload)
+        except (OSError, ValueError, TypeError, ImportError) as e:
+            # Values that are not JSON-serializable, or frames without a parquet engine, stay in memory only
+            print(f"--- ActionCache: could not persist entry to disk: {e} ---")
+
+    def _remove_files(self, key: str) -> None:
+        prefix = f"{key}."
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                except FileNotFoundError:
+                    pass
+
+
+_cache = None
+
+def get_action_cache() -> ActionCache:
+    """
+    Returns a singleton instance of the ActionCache.
+    Sharing one instance lets recurring queries hit the cache across workflow runs.
+    """
+    global _cache
+    if _cache is None:
+        _cache = ActionCache()
+    return _cache
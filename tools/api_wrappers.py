@@ -1,9 +1,87 @@
+import types
+import zlib
+from functools import lru_cache
 import pandas as pd
 import numpy as np
-from typing import List, Literal, Optional
+from typing import List, Literal, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 import re
 
+# --- Mock Data Dimensions ---
+# Dimension columns are generated as categoricals over these fixed category lists,
+# so filters and groupbys work on small integer codes instead of Python strings.
+
+BUSINESSES_CAT = pd.CategoricalDtype(["Prime", "Equities Ex Prime", "FICC"])
+SUBBUSINESSES_CAT = pd.CategoricalDtype(["PB", "SPG", "Futures", "DCS", "One Delta", "Eq Deriv", "Credit", "Macro"])
+REGIONS_CAT = pd.CategoricalDtype(["AMERICAS", "EMEA", "ASIA", "NA"])
+COUNTRIES_CAT = pd.CategoricalDtype(["USA", "CAN", "BRA", "GBR", "FRA", "DEU", "JPN", "HKG", "AUS"])
+FIN_OR_EXEC_CAT = pd.CategoricalDtype(["Financing", "Execution"])
+PRIMARY_OR_SECONDARY_CAT = pd.CategoricalDtype(["Primary", "Secondary"])
+BALANCE_TYPES_CAT = pd.CategoricalDtype(["Debit", "Credit", "Physical Shorts", "Synthetic Longs", "Synthetic Shorts"])
+
+def _code_table(dtype: pd.CategoricalDtype, rows: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encodes ragged option lists as a rectangular table of category codes (short rows are
+    padded with their last code) plus the number of real options in each row.
+    """
+    width = max(len(row) for row in rows)
+    codes = np.array([dtype.categories.get_indexer(row + row[-1:] * (width - len(row))) for row in rows], dtype=np.int8)
+    return codes, np.array([len(row) for row in rows], dtype=np.int8)
+
+# Countries per region, in REGIONS_CAT order
+_REGION_COUNTRY_CODES, _REGION_COUNTRY_COUNTS = _code_table(COUNTRIES_CAT, [
+    ["USA", "CAN", "BRA"],  # AMERICAS
+    ["GBR", "FRA", "DEU"],  # EMEA
+    ["JPN", "HKG", "AUS"],  # ASIA
+    ["USA", "CAN"],         # NA
+])
+# Balance types per subbusiness family: row 0 is PB-style, row 1 is SPG
+_BALANCE_TYPE_CODES, _BALANCE_TYPE_COUNTS = _code_table(BALANCE_TYPES_CAT, [
+    ["Debit", "Credit", "Physical Shorts"],
+    ["Synthetic Longs", "Synthetic Shorts"],
+])
+# Business filter values that stand for more than one business line
+BUSINESS_GROUPS = types.MappingProxyType({
+    "Equities": ("Prime", "Equities Ex Prime"),
+})
+# Row of _BALANCE_TYPE_CODES each subbusiness draws its balance types from
+_BALANCE_TYPE_ROWS = {
+    "PB": 0,
+    "SPG": 1,
+    "Futures": 0,
+    "DCS": 0,
+    "One Delta": 0,
+    "Eq Deriv": 0,
+    "Credit": 0,
+    "Macro": 0,
+}
+_BALANCE_TYPE_ROW_BY_CODE = np.array([_BALANCE_TYPE_ROWS[s] for s in SUBBUSINESSES_CAT.categories], dtype=np.intp)
+
+# Balance types each subbusiness carries; any other pair would only ever filter down to an empty frame
+VALID_BALANCE_TYPES = {
+    subbusiness: frozenset(BALANCE_TYPES_CAT.categories[_BALANCE_TYPE_CODES[row, :_BALANCE_TYPE_COUNTS[row]]])
+    for subbusiness, row in _BALANCE_TYPE_ROWS.items()
+}
+
+# Granularity values accepted by the API mapped to the mock data columns they group on
+GRANULARITY_COLUMNS = types.MappingProxyType({
+    "client": "client_id",
+    "date": "date",
+    "business": "business",
+    "subbusiness": "subbusiness",
+    "region": "region",
+    "country": "country",
+    "balance_type": "balance_type",
+    "fin_or_exec": "fin_or_exec",
+    "primary_or_secondary": "primary_or_secondary",
+})
+# Granularities that can be pivoted into columns
+PIVOT_GRANULARITIES = frozenset(GRANULARITY_COLUMNS) - {"client", "date"}
+
+def _random_categorical(rng: np.random.Generator, dtype: pd.CategoricalDtype, size: int) -> pd.Categorical:
+    """Draws `size` values uniformly from the categories of `dtype`."""
+    return pd.Categorical.from_codes(rng.integers(0, len(dtype.categories), size=size), dtype=dtype)
+
 # --- Main Data Generation & Filtering Function ---
 
 def _generate_mock_data(
@@ -28,132 +106,135 @@ def _generate_mock_data(
     row_granularity now accepts a list of up to 2 dimensions for multi-dimensional grouping.
     
     balance_type filtering rules:
-    - PB/Clearing subbusiness: "Debit", "Credit", "Physical Shorts"
+    - PB (and every other subbusiness except SPG): "Debit", "Credit", "Physical Shorts"
     - SPG subbusiness: "Synthetic Longs", "Synthetic Shorts"
     - Invalid combinations return empty DataFrame
     """
-    if row_granularity is None:
-        row_granularity = ["aggregate"]
-        
-    # 1. --- Generate Base Data ---
-    dates = pd.to_datetime(pd.date_range(start_date, end_date, freq='D'))
+    # Invalid subbusiness/balance_type combinations are known before any data is generated
+    if subbusiness in VALID_BALANCE_TYPES and balance_type and balance_type not in VALID_BALANCE_TYPES[subbusiness]:
+        return pd.DataFrame()
+
     base_client_list = client_ids if client_ids else [f"cl_id_{i}" for i in range(5)]
-    
-    businesses = ["Prime", "Equities Ex Prime", "FICC"]
-    subbusinesses = ["PB", "SPG", "Futures", "DCS", "One Delta", "Eq Deriv", "Credit", "Macro"]
-    regions = ["AMERICAS", "EMEA", "ASIA", "NA"]
-    country_map = {
-        "AMERICAS": ["USA", "CAN", "BRA"],
-        "EMEA": ["GBR", "FRA", "DEU"],
-        "ASIA": ["JPN", "HKG", "AUS"],
-        "NA": ["USA", "CAN"]
-    }
-    fin_or_exec_options = ["Financing", "Execution"]
-    primary_or_secondary_options = ["Primary", "Secondary"]
-
-    data = []
-    if not base_client_list: # Ensure data is generated if no clients are specified
-        base_client_list = [f"cl_id_{i}" for i in range(5)]
-
-    for date in dates:
-        for client_id in base_client_list:
-            for _ in range(np.random.randint(1, 4)): # Each client has a few random business lines each day
-                chosen_subbusiness = np.random.choice(subbusinesses)
-                chosen_region = np.random.choice(regions)
-                
-                # Generate appropriate balance_type based on subbusiness
-                if chosen_subbusiness in ["PB", "Clearing"]:
-                    balance_type_options = ["Debit", "Credit", "Physical Shorts"]
-                elif chosen_subbusiness == "SPG":
-                    balance_type_options = ["Synthetic Longs", "Synthetic Shorts"]
-                else:
-                    # For other subbusinesses, use PB-style balance types as default
-                    balance_type_options = ["Debit", "Credit", "Physical Shorts"]
-                
-                data.append({
-                    "date": date, "client_id": client_id, "business": np.random.choice(businesses),
-                    "subbusiness": chosen_subbusiness, "region": chosen_region,
-                    "country": np.random.choice(country_map.get(chosen_region, ["USA"])),
-                    "fin_or_exec": np.random.choice(fin_or_exec_options),
-                    "primary_or_secondary": np.random.choice(primary_or_secondary_options),
-                    "balance_type": np.random.choice(balance_type_options),
-                    "revenues": np.random.randint(1000, 50000), "balances": np.random.randint(100000, 5000000)
-                })
-
-    if not data:
+    df = _generate_base_data(start_date, end_date, tuple(base_client_list))
+    return _filter_and_aggregate(
+        df, metric, client_ids, region, country, business, subbusiness,
+        fin_or_exec, primary_or_secondary, balance_type, row_granularity, col_granularity
+    )
+
+@lru_cache(maxsize=32)
+def _generate_base_data(start_date: str, end_date: str, client_ids: Tuple[str, ...]) -> pd.DataFrame:
+    """
+    Generates the unfiltered daily data for a date range and set of clients.
+    The generator is seeded from the arguments, so the same request always sees the same
+    data, and the result is memoized so that varying only the filters or granularity does
+    not regenerate it. The returned frame is shared between callers and must not be mutated.
+    """
+    rng = np.random.default_rng(zlib.crc32(repr((start_date, end_date, client_ids)).encode()))
+    dates = pd.date_range(start_date, end_date, freq='D')
+
+    # Each client has a few (1-3) random business lines each day. All rows are drawn
+    # column by column at once rather than appended one dict at a time.
+    n_pairs = len(dates) * len(client_ids)
+    rows_per_pair = rng.integers(1, 4, size=n_pairs)
+    n_rows = int(rows_per_pair.sum())
+    if n_rows == 0:
         return pd.DataFrame() # Return empty frame if no data was generated
-    
-    df = pd.DataFrame(data)
+
+    clients_cat = pd.CategoricalDtype(pd.unique(pd.Series(client_ids)))
+    pair_dates = np.repeat(dates.values, len(client_ids))
+    pair_clients = np.tile(clients_cat.categories.get_indexer(client_ids), len(dates))
+
+    subbusiness_codes = rng.integers(0, len(SUBBUSINESSES_CAT.categories), size=n_rows)
+    region_codes = rng.integers(0, len(REGIONS_CAT.categories), size=n_rows)
+    country_idx = rng.integers(0, _REGION_COUNTRY_COUNTS[region_codes])
+    balance_type_rows = _BALANCE_TYPE_ROW_BY_CODE[subbusiness_codes]
+    balance_type_idx = rng.integers(0, _BALANCE_TYPE_COUNTS[balance_type_rows])
+
+    return pd.DataFrame({
+        "date": np.repeat(pair_dates, rows_per_pair),
+        "client_id": pd.Categorical.from_codes(np.repeat(pair_clients, rows_per_pair), dtype=clients_cat),
+        "business": _random_categorical(rng, BUSINESSES_CAT, n_rows),
+        "subbusiness": pd.Categorical.from_codes(subbusiness_codes, dtype=SUBBUSINESSES_CAT),
+        "region": pd.Categorical.from_codes(region_codes, dtype=REGIONS_CAT),
+        "country": pd.Categorical.from_codes(_REGION_COUNTRY_CODES[region_codes, country_idx], dtype=COUNTRIES_CAT),
+        "fin_or_exec": _random_categorical(rng, FIN_OR_EXEC_CAT, n_rows),
+        "primary_or_secondary": _random_categorical(rng, PRIMARY_OR_SECONDARY_CAT, n_rows),
+        "balance_type": pd.Categorical.from_codes(_BALANCE_TYPE_CODES[balance_type_rows, balance_type_idx], dtype=BALANCE_TYPES_CAT),
+        "revenues": rng.integers(1000, 50000, size=n_rows),
+        "balances": rng.integers(100000, 5000000, size=n_rows),
+    })
+
+def _filter_and_aggregate(
+    df: pd.DataFrame,
+    metric: Literal["revenues", "balances"],
+    client_ids: Optional[List[str]] = None,
+    region: Optional[List[str]] = None,
+    country: Optional[List[str]] = None,
+    business: Optional[Literal["Prime", "Equities Ex Prime", "FICC", "Equities"]] = None,
+    subbusiness: Optional[Literal["PB", "SPG", "Futures", "DCS", "One Delta", "Eq Deriv", "Credit", "Macro"]] = None,
+    fin_or_exec: Optional[List[str]] = None,
+    primary_or_secondary: Optional[List[str]] = None,
+    balance_type: Optional[Literal["Debit", "Credit", "Physical Shorts", "Synthetic Longs", "Synthetic Shorts"]] = None,
+    row_granularity: Optional[List[str]] = None,
+    col_granularity: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Filters and aggregates the base data (the server-side half of the mock API).
+    `df` may be the shared cached frame, so it is only ever sliced, never modified in place.
+    """
+    if row_granularity is None:
+        row_granularity = ["aggregate"]
+
+    if df.empty:
+        return pd.DataFrame()
 
     # 2. --- Apply Filters ---
-    if client_ids: # Note: This check is different from the one for base_client_list
-        df = df[df['client_id'].isin(client_ids)]
+    # The predicates are AND-ed into one mask and the frame is sliced once at the end.
+    # The base data only contains the requested clients, so there is no client filter.
+    mask = np.ones(len(df), dtype=bool)
     if region:
-        df = df[df['region'].isin(region)]
+        mask &= _isin_codes(df['region'], region)
     if country:
-        df = df[df['country'].isin(country)]
+        mask &= _isin_codes(df['country'], country)
     if fin_or_exec:
-        df = df[df['fin_or_exec'].isin(fin_or_exec)]
+        mask &= _isin_codes(df['fin_or_exec'], fin_or_exec)
     if primary_or_secondary:
-        df = df[df['primary_or_secondary'].isin(primary_or_secondary)]
+        mask &= _isin_codes(df['primary_or_secondary'], primary_or_secondary)
     if business:
-        if business == "Equities":
-            df = df[df['business'].isin(["Prime", "Equities Ex Prime"])]
-        else:
-            df = df[df['business'] == business]
+        mask &= _isin_codes(df['business'], BUSINESS_GROUPS.get(business, (business,)))
     if subbusiness:
-        df = df[df['subbusiness'] == subbusiness]
+        mask &= _isin_codes(df['subbusiness'], [subbusiness])
     
-    # Apply balance_type filter with validation
+    # Combinations of subbusiness and balance_type were validated by _generate_mock_data
     if balance_type:
-        # First validate that balance_type is compatible with subbusiness
-        if not df.empty:
-            unique_subbusinesses = df['subbusiness'].unique()
-            
-            # Check for invalid combinations and return empty DataFrame if found
-            for sb in unique_subbusinesses:
-                if sb in ["PB", "Clearing"] and balance_type not in ["Debit", "Credit", "Physical Shorts"]:
-                    return pd.DataFrame()  # Invalid combination
-                elif sb == "SPG" and balance_type not in ["Synthetic Longs", "Synthetic Shorts"]:
-                    return pd.DataFrame()  # Invalid combination
-        
-        # Apply the filter if validation passes
-        df = df[df['balance_type'] == balance_type]
+        mask &= _isin_codes(df['balance_type'], [balance_type])
 
-    if df.empty:
+    if not mask.any():
         return pd.DataFrame()
 
     # 3. --- Aggregate Data Based on Row Granularity ---
     if "aggregate" in row_granularity:
-        total = df[metric].sum() if metric == 'revenues' else df[metric].mean()
-        return pd.DataFrame({metric: [total]})
-    
-    # Map granularity values to actual column names
-    granularity_column_map = {
-        "client": "client_id",
-        "date": "date",
-        "business": "business",
-        "subbusiness": "subbusiness",
-        "region": "region",
-        "country": "country",
-        "balance_type": "balance_type",
-        "fin_or_exec": "fin_or_exec",
-        "primary_or_secondary": "primary_or_secondary"
-    }
+        # Reduce the masked metric column directly instead of slicing the whole frame
+        values = df[metric].to_numpy()[mask]
+        total = values.sum() if metric == 'revenues' else values.mean()
+        return pd.DataFrame({metric: np.array([total])}, index=pd.RangeIndex(1))
+
+    if not mask.all():
+        df = df[mask]
     
     # Build group columns from row_granularity
     group_cols = []
     for granularity in row_granularity:
-        if granularity in granularity_column_map:
-            col_name = granularity_column_map[granularity]
+        if granularity in GRANULARITY_COLUMNS:
+            col_name = GRANULARITY_COLUMNS[granularity]
             if col_name in df.columns:
                 group_cols.append(col_name)
     
     # Also include columns needed for column granularity (these will be preserved for pivoting)
     if col_granularity:
         for granularity in col_granularity:
-            if granularity in granularity_column_map:
-                col_name = granularity_column_map[granularity]
+            if granularity in GRANULARITY_COLUMNS:
+                col_name = GRANULARITY_COLUMNS[granularity]
                 if col_name in df.columns and col_name not in group_cols:
                     group_cols.append(col_name)
     
@@ -165,27 +246,98 @@ def _generate_mock_data(
         # For time series, we want to handle multiple clients properly
         agg_func = 'sum' if metric == 'revenues' else 'mean'
         
-        if len(df['client_id'].unique()) > 1 and "client_id" not in group_cols:
+        if df['client_id'].nunique() > 1 and "client_id" not in group_cols:
             # Multiple clients but client not in grouping - add client to preserve structure
             group_cols_with_client = group_cols + ["client_id"]
-            agg_df = df.groupby(group_cols_with_client)[metric].agg(agg_func).reset_index()
+            agg_df = df.groupby(group_cols_with_client, as_index=False, observed=True, sort=False)[metric].agg(agg_func)
             # Add client name for better plotting
-            agg_df['client_name'] = agg_df['client_id'].apply(lambda x: x.replace('cl_id_', '').title())
+            agg_df['client_name'] = _client_names(agg_df['client_id'])
+        elif group_cols == ["date"]:
+            # The base data is generated date-major, so the dates are already in runs
+            agg_df = _sorted_group_reduce(df, "date", metric, agg_func)
         else:
             # Standard grouping
-            agg_df = df.groupby(group_cols)[metric].agg(agg_func).reset_index()
+            agg_df = df.groupby(group_cols, as_index=False, observed=True, sort=False)[metric].agg(agg_func)
         return agg_df
     
     # Standard aggregation for non-date granularities
     agg_func = 'sum' if metric == 'revenues' else 'mean'
-    agg_df = df.groupby(group_cols)[metric].agg(agg_func).reset_index()
+    if len(group_cols) == 1 and isinstance(df[group_cols[0]].dtype, pd.CategoricalDtype):
+        agg_df = _group_reduce(df, group_cols[0], metric, agg_func)
+    else:
+        agg_df = df.groupby(group_cols, as_index=False, observed=True, sort=False)[metric].agg(agg_func)
     
     # Add client names for better display if client is in the grouping
     if 'client_id' in group_cols:
-        agg_df['client_name'] = agg_df['client_id'].apply(lambda x: x.replace('cl_id_', '').title())
+        agg_df['client_name'] = _client_names(agg_df['client_id'])
     
     return agg_df
 
+def _isin_codes(column: pd.Series, values: Sequence[str]) -> np.ndarray:
+    """
+    Boolean mask of the rows of a categorical column whose value is in `values`.
+    The values are translated to category codes once and rows are matched through a
+    lookup table indexed by code, so no strings are hashed per row.
+    """
+    keys = column.array
+    wanted = keys.categories.get_indexer(values)
+    # One extra slot so that missing values (code -1) look up False
+    table = np.zeros(len(keys.categories) + 1, dtype=bool)
+    table[wanted[wanted >= 0]] = True
+    return table[keys.codes]
+
+def _client_name(client_id: str) -> str:
+    """Display name for a client ID, e.g. 'cl_id_millennium' -> 'Millennium'."""
+    return client_id.removeprefix('cl_id_').title()
+
+def _client_names(client_ids: pd.Series) -> pd.Series:
+    """
+    Display names for a column of client IDs.
+    On a categorical column the name is derived once per category rather than once per row.
+    """
+    if isinstance(client_ids.dtype, pd.CategoricalDtype):
+        return client_ids.map(_client_name)
+    return client_ids.str.removeprefix('cl_id_').str.title()
+
+def _group_reduce(df: pd.DataFrame, group_col: str, metric: str, agg_func: Literal["sum", "mean"]) -> pd.DataFrame:
+    """
+    Single-key sum/mean over a categorical column, computed with np.bincount on the category codes.
+    Equivalent to `df.groupby(group_col, as_index=False, observed=True)[metric].agg(agg_func)`.
+    """
+    keys = df[group_col].array
+    values = df[metric].to_numpy()
+    n_groups = len(keys.categories)
+    counts = np.bincount(keys.codes, minlength=n_groups)
+    totals = np.bincount(keys.codes, weights=values, minlength=n_groups)
+    observed = np.flatnonzero(counts)
+    if agg_func == 'sum':
+        result = totals[observed]
+        if values.dtype.kind in "iu":
+            result = result.astype(values.dtype)  # bincount accumulates in float64
+    else:
+        result = totals[observed] / counts[observed]
+    return pd.DataFrame({
+        group_col: pd.Categorical.from_codes(observed, dtype=keys.dtype),
+        metric: result,
+    })
+
+def _sorted_group_reduce(df: pd.DataFrame, group_col: str, metric: str, agg_func: Literal["sum", "mean"]) -> pd.DataFrame:
+    """
+    Single-key sum/mean over a column whose equal values are contiguous, computed in one
+    linear pass with np.add.reduceat. Falls back to a groupby if the column is not sorted.
+    """
+    keys = df[group_col].to_numpy()
+    codes = keys.view('i8') if keys.dtype.kind == 'M' else keys
+    if len(codes) > 1 and (np.diff(codes) < 0).any():
+        return df.groupby(group_col, as_index=False, sort=True)[metric].agg(agg_func)
+
+    values = df[metric].to_numpy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    result = np.add.reduceat(values, starts)
+    if agg_func == 'mean':
+        result = result / np.diff(np.r_[starts, len(values)])
+    return pd.DataFrame({group_col: keys[starts], metric: result})
+
 # --- API Wrappers ---
 
 def get_revenues(
@@ -347,62 +499,65 @@ def get_balances_decomposition(
         
         if not mock_df.empty and "balances" in mock_df.columns:
             # Create decomposition columns
-            mock_df = mock_df.rename(columns={"balances": "total_balance"})
-            mock_df["cash"] = mock_df["total_balance"] * 0.3
-            mock_df["securities"] = mock_df["total_balance"] * 0.5
-            mock_df["other"] = mock_df["total_balance"] * 0.2
+            total = mock_df["balances"].to_numpy()
+            mock_df = mock_df.rename(columns={"balances": "total_balance"}).assign(
+                cash=total * 0.3,
+                securities=total * 0.5,
+                other=total * 0.2,
+            )
 
         return mock_df
 
     except Exception as e:
         return pd.DataFrame() 
 
+# Fixed date ranges recognised by _parse_date_range, checked in order (quarters before the whole year)
+_FIXED_DATE_RANGES = (
+    ("Q1 2024", ("2024-01-01", "2024-03-31")),
+    ("Q2 2024", ("2024-04-01", "2024-06-30")),
+    ("Q3 2024", ("2024-07-01", "2024-09-30")),
+    ("Q4 2024", ("2024-10-01", "2024-12-31")),
+    ("2024", ("2024-01-01", "2024-12-31")),
+)
+
 def _parse_date_range(date_description: str) -> tuple[str, str]:
     """
     Parse natural language date description into start_date and end_date.
     This is a simplified version - a real implementation would be more sophisticated.
     """
     # Simple parsing for common patterns
-    if "Q1 2024" in date_description:
-        return "2024-01-01", "2024-03-31"
-    elif "Q2 2024" in date_description:
-        return "2024-04-01", "2024-06-30"
-    elif "Q3 2024" in date_description:
-        return "2024-07-01", "2024-09-30"
-    elif "Q4 2024" in date_description:
-        return "2024-10-01", "2024-12-31"
-    elif "2024" in date_description:
-        return "2024-01-01", "2024-12-31"
-    elif "last 30 days" in date_description.lower():
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
-    else:
-        # Default to last month
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    for token, date_range in _FIXED_DATE_RANGES:
+        if token in date_description:
+            return date_range
+
+    # "last 30 days" and anything unrecognised both default to the last month
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=30)
+    return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+
+# Lowercase name fragments of known clients and their IDs, checked in order
+_KNOWN_CLIENT_PATTERNS = (
+    ("millennium", "cl_id_millennium"),
+    ("systematic", "cl_id_systematic"),
+    ("citadel", "cl_id_citadel"),
+    ("two sigma", "cl_id_two_sigma"),
+    ("bridgewater", "cl_id_bridgewater"),
+)
 
+@lru_cache(maxsize=256)
 def _resolve_client_name(entity: str) -> str:
     """
     Convert entity name to client ID.
     This is a simplified mapping - real implementation would use a lookup service.
     """
     entity_lower = entity.lower()
-    if "millennium" in entity_lower:
-        return "cl_id_millennium"
-    elif "systematic" in entity_lower:
-        return "cl_id_systematic"
-    elif "citadel" in entity_lower:
-        return "cl_id_citadel"
-    elif "two sigma" in entity_lower:
-        return "cl_id_two_sigma"
-    elif "bridgewater" in entity_lower:
-        return "cl_id_bridgewater"
-    else:
-        # Generate a consistent ID based on the name
-        clean_name = entity.lower().replace(' ', '_').replace('.', '').replace('-', '_')
-        return f"cl_id_{clean_name}"
+    for pattern, client_id in _KNOWN_CLIENT_PATTERNS:
+        if pattern in entity_lower:
+            return client_id
+
+    # Generate a consistent ID based on the name
+    clean_name = entity_lower.replace(' ', '_').replace('.', '').replace('-', '_')
+    return f"cl_id_{clean_name}"
 
 def _apply_column_granularity(df: pd.DataFrame, col_granularity: List[str], metric: str) -> pd.DataFrame:
     """
@@ -412,24 +567,12 @@ def _apply_column_granularity(df: pd.DataFrame, col_granularity: List[str], metr
     if df.empty or not col_granularity:
         return df
     
-    # Map granularity values to actual column names
-    granularity_column_map = {
-        "aggregate": None,  # Special case
-        "business": "business",
-        "subbusiness": "subbusiness", 
-        "region": "region",
-        "country": "country",
-        "balance_type": "balance_type",
-        "fin_or_exec": "fin_or_exec",
-        "primary_or_secondary": "primary_or_secondary"
-    }
-    
     # Handle aggregate case
     if "aggregate" in col_granularity:
         # Sum the metric column across all remaining dimensions
         remaining_cols = [col for col in df.columns if col not in [metric] and not col.endswith('_name')]
         if remaining_cols:
-            agg_df = df.groupby(remaining_cols)[metric].sum().reset_index()
+            agg_df = df.groupby(remaining_cols, as_index=False, observed=True, sort=False)[metric].sum()
             total = agg_df[metric].sum()
             return pd.DataFrame({**{col: agg_df[col].iloc[0] if len(agg_df) == 1 else 'Multiple' for col in remaining_cols}, 
                                f"{metric}_total": [total]})
@@ -440,8 +583,8 @@ def _apply_column_granularity(df: pd.DataFrame, col_granularity: List[str], metr
     # Find the column to pivot on (take the first valid one)
     pivot_col = None
     for granularity in col_granularity:
-        if granularity in granularity_column_map and granularity_column_map[granularity]:
-            col_name = granularity_column_map[granularity]
+        if granularity in PIVOT_GRANULARITIES:
+            col_name = GRANULARITY_COLUMNS[granularity]
             if col_name in df.columns:
                 pivot_col = col_name
                 break
@@ -460,34 +603,24 @@ def _apply_column_granularity(df: pd.DataFrame, col_granularity: List[str], metr
                 index=index_cols,
                 columns=pivot_col,
                 aggfunc='sum',
-                fill_value=0
+                fill_value=0,
+                observed=True
             )
             
-            # Reset index and flatten column names
+            # `values` is a single column, so the pivoted columns are a flat index of pivot
+            # values; prefix them with the metric (which also drops the columns name) before
+            # moving the index columns back into the frame
+            pivot_df.columns = [f"{metric}_{col}" for col in pivot_df.columns]
             pivot_df = pivot_df.reset_index()
             
-            # Flatten multi-level columns if any
-            if isinstance(pivot_df.columns, pd.MultiIndex):
-                pivot_df.columns = [f"{metric}_{col}" if col != '' else index_col 
-                                  for index_col, col in pivot_df.columns]
-            else:
-                # Rename columns to include metric prefix for pivoted values
-                new_columns = {}
-                for col in pivot_df.columns:
-                    if col in index_cols:
-                        new_columns[col] = col
-                    else:
-                        new_columns[col] = f"{metric}_{col}"
-                pivot_df = pivot_df.rename(columns=new_columns)
-            
             # Add client names if client_id is present
             if 'client_id' in pivot_df.columns:
-                pivot_df['client_name'] = pivot_df['client_id'].apply(lambda x: x.replace('cl_id_', '').title())
+                pivot_df['client_name'] = _client_names(pivot_df['client_id'])
             
             return pivot_df
         else:
             # No index columns, just group by pivot column
-            return df.groupby(pivot_col)[metric].sum().reset_index()
+            return df.groupby(pivot_col, as_index=False, observed=True, sort=False)[metric].sum()
             
     except Exception as e:
         print(f"Error in column granularity pivot: {e}")
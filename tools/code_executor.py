@@ -1,12 +1,56 @@
+from functools import lru_cache
 from typing import Dict
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
 import os
+import threading
 import time
 
+from agent.config import COMPILED_CODE_CACHE_SIZE
 from agent.workspace import AgentWorkspace
 
+# plot_timeseries redraws one reused Figure instead of opening a new pyplot figure per call.
+# The Figure is created outside pyplot, so it never enters pyplot's global figure registry.
+_plot_lock = threading.Lock()
+_plot_figure = None
+
+def _render_timeseries(df: pd.DataFrame, date_col: str, value_cols, title: str, figsize, save_path: str) -> None:
+    """Draws the time series on the shared figure and saves it to save_path."""
+    global _plot_figure
+    with _plot_lock:
+        if _plot_figure is None:
+            _plot_figure = Figure()
+            _plot_figure.add_subplot()
+        fig = _plot_figure
+        ax = fig.axes[0]
+        ax.clear()
+        fig.set_size_inches(figsize)
+        
+        for col in value_cols:
+            if col in df.columns:
+                ax.plot(df[date_col], df[col], marker='o', label=col, linewidth=2)
+        
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Value', fontsize=12)
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(axis='x', labelrotation=45)
+        fig.tight_layout()
+        
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        fig.savefig(save_path, dpi=300, bbox_inches='tight')
+
+@lru_cache(maxsize=COMPILED_CODE_CACHE_SIZE)
+def _compile_code(code: str):
+    """
+    Compiles a code snippet once; retried and repeated steps reuse the code object.
+    Keyed on the source text itself, so distinct snippets can never collide.
+    """
+    return compile(code, "<agent_code>", "exec")
+
 def describe_dataframe(workspace: AgentWorkspace, df_name: str) -> str:
     """
     Returns a string describing the schema of a dataframe in the workspace.
@@ -59,31 +103,12 @@ def execute_python_code(workspace: AgentWorkspace, code: str) -> AgentWorkspace:
             numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
             value_cols = [col for col in numeric_cols if col != date_col]
         
-        # Create the plot
-        plt.figure(figsize=figsize)
-        
-        for col in value_cols:
-            if col in df.columns:
-                plt.plot(df[date_col], df[col], marker='o', label=col, linewidth=2)
-        
-        plt.title(title, fontsize=14, fontweight='bold')
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Value', fontsize=12)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
         # Generate save path if not provided
         if save_path is None:
             timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
             save_path = f'static/plots/timeseries_{timestamp}.png'
         
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        plt.close()  # Important: close the figure to free memory
+        _render_timeseries(df, date_col, value_cols, title, figsize, save_path)
         
         # CRITICAL: Verify the file was actually saved where expected
         if not os.path.exists(save_path):
@@ -118,22 +143,7 @@ def execute_python_code(workspace: AgentWorkspace, code: str) -> AgentWorkspace:
                 print(f"No temp files found. Regenerating plot at: {backup_path}")
                 
                 # Re-create the plot with new path
-                plt.figure(figsize=figsize)
-                for col in value_cols:
-                    if col in df.columns:
-                        plt.plot(df[date_col], df[col], marker='o', label=col, linewidth=2)
-                
-                plt.title(title, fontsize=14, fontweight='bold')
-                plt.xlabel('Date', fontsize=12)
-                plt.ylabel('Value', fontsize=12)
-                plt.legend()
-                plt.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                
-                os.makedirs(os.path.dirname(backup_path), exist_ok=True)
-                plt.savefig(backup_path, dpi=300, bbox_inches='tight')
-                plt.close()
+                _render_timeseries(df, date_col, value_cols, title, figsize, backup_path)
                 
                 if os.path.exists(backup_path):
                     save_path = backup_path
@@ -160,13 +170,17 @@ def execute_python_code(workspace: AgentWorkspace, code: str) -> AgentWorkspace:
     
     # Execute the code
     try:
-        exec(code, {'pd': pd, 'plt': plt, 'np': np, 'plot_timeseries': plot_timeseries}, local_scope)
+        exec(_compile_code(code), {'pd': pd, 'plt': plt, 'np': np, 'plot_timeseries': plot_timeseries}, local_scope)
     except Exception as e:
         print(f"--- Code Execution Error: {e} ---")
         raise
         
-    # Update the workspace with the potentially modified dataframes
-    workspace.dataframes = local_scope['dataframes']
+    # The code normally mutates workspace.dataframes itself; only if it rebound the
+    # name to a new dict do its contents need copying back into the workspace
+    result = local_scope['dataframes']
+    if result is not workspace.dataframes:
+        workspace.dataframes.clear()
+        workspace.dataframes.update(result)
     
     # CRITICAL: Validate any plot files referenced in dataframes actually exist
     for df_name, df in workspace.dataframes.items():
@@ -1,10 +1,36 @@
-from typing import List, Literal, Optional, Any
+import json
+import logging
+from typing import List, Literal, Optional, Any, Tuple
 import pandas as pd
 from pydantic import BaseModel, Field, validator
 
-from .resolvers import resolve_clients, resolve_dates, resolve_regions, resolve_countries, resolve_fin_or_exec, resolve_primary_or_secondary
+from agent.config import QUERY_CACHE_SIZE
+from agent.models import validate_granularity
+from .action_cache import ActionCache
+from .resolvers import resolve_clients, resolve_dates, resolve_dates_batch, resolve_regions, resolve_countries, resolve_fin_or_exec, resolve_primary_or_secondary
 from .api_wrappers import get_revenues, get_balances, get_balances_decomposition, get_capital
 
+logger = logging.getLogger(__name__)
+
+# Low-cardinality dimension columns, returned as categoricals (integer codes plus one copy of each label)
+CATEGORICAL_COLUMNS = ("client_id", "client_name", "business", "subbusiness", "region", "country",
+                       "balance_type", "fin_or_exec", "primary_or_secondary")
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts the string dimension columns of a result to categorical dtype, in place.
+    Categories the query filtered out are dropped, so that a plain groupby in generated
+    code only produces groups for values that are actually present.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col not in df.columns:
+            continue
+        if df[col].dtype == object:
+            df[col] = df[col].astype("category")
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+    return df
+
 class InformUserInput(BaseModel):
     """Input model for the InformUserTool."""
     message: str = Field(..., description="The message to convey to the user.")
@@ -45,64 +71,82 @@ class SimpleQueryInput(BaseModel):
     @validator('row_granularity')
     def validate_row_granularity(cls, v):
         """Ensure row_granularity has no duplicates and valid combinations."""
-        if len(v) != len(set(v)):
-            raise ValueError("row_granularity cannot contain duplicate values")
-        
-        # Special validation: if aggregate is included, it must be the only value
-        if "aggregate" in v and len(v) > 1:
-            raise ValueError("When 'aggregate' is used in row_granularity, it must be the only value")
-        
-        return v
+        return validate_granularity("row_granularity", v)
 
     @validator('col_granularity')
     def validate_col_granularity(cls, v, values):
         """Ensure col_granularity has no duplicates and doesn't overlap with row_granularity."""
         if v is None:
             return v
-        
-        if len(v) != len(set(v)):
-            raise ValueError("col_granularity cannot contain duplicate values")
-        
-        # Check for overlap with row_granularity
-        row_granularity = values.get('row_granularity', [])
-        overlap = set(v) & set(row_granularity)
-        if overlap:
-            raise ValueError(f"col_granularity cannot contain values that are already in row_granularity: {overlap}")
-        
-        # Special validation: if aggregate is included, it must be the only value
-        if "aggregate" in v and len(v) > 1:
-            raise ValueError("When 'aggregate' is used in col_granularity, it must be the only value")
-            
-        return v
+        return validate_granularity("col_granularity", v, values.get('row_granularity', []))
 
 class SimpleQueryTool:
     """
     A tool to execute simple, single-API queries.
     It orchestrates resolvers and API wrappers to fulfill a structured request.
+    Results are memoized per tool instance, since the APIs are idempotent for a given query and date range.
     """
 
+    def __init__(self):
+        self._cache = ActionCache(maxsize=QUERY_CACHE_SIZE, cache_dir=None)
+
     def execute(self, query_input: SimpleQueryInput) -> pd.DataFrame:
         """
         Takes a structured query object, resolves entities, and calls the correct API.
         """
+        return self._cached_execute(query_input, resolve_dates(query_input.date_description))
+
+    def execute_batch(self, query_inputs: List[SimpleQueryInput]) -> List[pd.DataFrame]:
+        """
+        Executes several queries, returning one dataframe per input in the same order.
+        Identical queries run only once, and all date descriptions are resolved
+        together so that at most one LLM call is made for the whole batch.
+        """
+        print(f"\n--- Executing SimpleQueryTool batch of {len(query_inputs)} queries ---")
+        dates = resolve_dates_batch([q.date_description for q in query_inputs])
+
+        results = {}
+        frames = []
+        for query_input in query_inputs:
+            signature = json.dumps(query_input.model_dump(), sort_keys=True, default=str)
+            if signature in results:
+                frames.append(results[signature].copy())
+                continue
+            results[signature] = self._cached_execute(query_input, dates[query_input.date_description])
+            frames.append(results[signature])
+        return frames
+
+    def _cached_execute(self, query_input: SimpleQueryInput, dates: Tuple[str, str]) -> pd.DataFrame:
+        """
+        Runs the query unless an identical one was already answered.
+        The resolved dates are part of the key, so relative descriptions such as
+        'last year' do not reuse results across a change of date.
+        """
+        key = self._cache.make_key("simple_query", {"query": query_input.model_dump(), "dates": dates})
+        hit, result = self._cache.get(key)
+        if hit:
+            print("--- SimpleQueryTool: cache hit ---")
+            return result.copy()
+        result = self._execute(query_input, dates)
+        self._cache.put(key, result.copy())
+        return result
+
+    def _execute(self, query_input: SimpleQueryInput, dates: Tuple[str, str]) -> pd.DataFrame:
         print("\n--- Executing SimpleQueryTool ---")
         
         # 1. Resolve entities using our robust resolvers (for display/validation only)
         client_ids = resolve_clients(query_input.entities)
-        start_date, end_date = resolve_dates(query_input.date_description)
+        start_date, end_date = dates
         regions = resolve_regions(query_input.regions)
         countries = resolve_countries(query_input.countries)
         fin_or_exec = resolve_fin_or_exec(query_input.fin_or_exec)
         primary_or_secondary = resolve_primary_or_secondary(query_input.primary_or_secondary)
 
-        print(f"Resolved Clients: {client_ids}")
-        print(f"Resolved Dates: {start_date} to {end_date}")
-        print(f"Resolved Regions: {regions}")
-        print(f"Resolved Countries: {countries}")
-        print(f"Resolved Fin/Exec: {fin_or_exec}")
-        print(f"Resolved Primary/Secondary: {primary_or_secondary}")
-        print(f"Row Granularity: {query_input.row_granularity}")
-        print(f"Col Granularity: {query_input.col_granularity}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Resolved clients=%s dates=%s to %s regions=%s countries=%s fin_or_exec=%s "
+                         "primary_or_secondary=%s row_granularity=%s col_granularity=%s",
+                         client_ids, start_date, end_date, regions, countries, fin_or_exec,
+                         primary_or_secondary, query_input.row_granularity, query_input.col_granularity)
 
         # 2. Select the correct API function based on the metric
         if query_input.metric == "revenues":
@@ -152,4 +196,4 @@ class SimpleQueryTool:
             )
         
         print("--- SimpleQueryTool Execution Finished ---")
-        return result_df 
\ No newline at end of file
+        return _categorize(result_df) 
\ No newline at end of file
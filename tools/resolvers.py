@@ -1,10 +1,11 @@
-from typing import List, Dict, Set
+from typing import List, Dict, Optional, Set, Tuple
 import re
 import json
 import os
 from dateutil.parser import parse
 from dateutil.relativedelta import relativedelta
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
 from pydantic import BaseModel, Field
 from openai import OpenAI
 from dotenv import load_dotenv
@@ -14,7 +15,8 @@ from rapidfuzz import process, fuzz
 
 from knowledge_base.client_data import CLIENT_NAME_TO_ID, CLIENT_GROUP_TO_IDS, VALID_BUSINESSES, VALID_SUBBUSINESSES
 from agent.llm_client import get_llm_client
-from agent.config import DATE_PARSER_MODEL
+from agent.config import CLIENT_RESOLUTION_CACHE_SIZE, DATE_PARSER_MODEL, DATE_RANGE_CACHE_SIZE
+from .action_cache import ActionCache
 
 # --- Canonical Values and Mappings ---
 
@@ -140,6 +142,13 @@ def resolve_clients(names: List[str]) -> List[str]:
     if not names:
         return []
 
+    # The result is order-independent, so sort the names to share cache entries
+    return list(_resolve_clients_cached(tuple(sorted(names))))
+
+
+@lru_cache(maxsize=CLIENT_RESOLUTION_CACHE_SIZE)
+def _resolve_clients_cached(names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """(Internal) Memoized body of resolve_clients; the knowledge base is static."""
     # Combine all known client and group names for efficient matching
     all_known_entities = list(CLIENT_NAME_TO_ID.keys()) + list(CLIENT_GROUP_TO_IDS.keys())
     resolved_ids: Set[str] = set()
@@ -164,7 +173,7 @@ def resolve_clients(names: List[str]) -> List[str]:
         elif best_match in CLIENT_NAME_TO_ID:
             resolved_ids.add(CLIENT_NAME_TO_ID[best_match])
 
-    return list(resolved_ids)
+    return tuple(resolved_ids)
 
 
 def resolve_sub_businesses(names: List[str]) -> List[str]:
@@ -190,6 +199,9 @@ class DateRange(BaseModel):
     start_date: str = Field(..., description="The start date in YYYY-MM-DD format.")
     end_date: str = Field(..., description="The end date in YYYY-MM-DD format.")
 
+class DateRanges(BaseModel):
+    ranges: List[DateRange] = Field(..., description="One date range per date description, in the same order as the descriptions were given.")
+
 def _get_llm_date_range(date_description: str) -> (str, str):
     """(Internal) Use an LLM to parse a complex date description."""
     client = get_llm_client()
@@ -219,11 +231,123 @@ Respond with ONLY the JSON object.
         print(f"--- LLM Date Parsing failed: {e}. Raising exception. ---")
         raise
 
+def _get_llm_date_ranges(date_descriptions: List[str]) -> Dict[str, Tuple[str, str]]:
+    """(Internal) Use a single LLM call to parse several complex date descriptions."""
+    client = get_llm_client()
+    
+    schema = DateRanges.model_json_schema()
+    
+    prompt = f"""
+You are a date parsing expert. Your sole job is to convert each of the user's natural language date descriptions into a precise start and end date.
+The current date is {datetime.now().strftime('%Y-%m-%d')}.
+You must respond with a single, valid JSON object that conforms to the following JSON Schema:
+{json.dumps(schema, indent=2)}
+
+User's date descriptions, in order: {json.dumps(date_descriptions)}
+
+Return exactly {len(date_descriptions)} ranges, one per description, in the same order.
+Respond with ONLY the JSON object.
+"""
+    try:
+        response = client.chat.completions.create(
+            model=DATE_PARSER_MODEL,
+            messages=[{"role": "system", "content": prompt}],
+            response_format={"type": "json_object"}
+        )
+        response_json = json.loads(response.choices[0].message.content)
+        date_ranges = DateRanges.model_validate(response_json)
+        # Ranges are matched to descriptions by position, so a short or long answer cannot be aligned
+        if len(date_ranges.ranges) != len(date_descriptions):
+            raise ValueError(f"Expected {len(date_descriptions)} date ranges, got {len(date_ranges.ranges)}")
+        return {desc: (r.start_date, r.end_date) for desc, r in zip(date_descriptions, date_ranges.ranges)}
+    except Exception as e:
+        print(f"--- LLM Date Parsing failed: {e}. Raising exception. ---")
+        raise
+
+def _default_date_range() -> Tuple[str, str]:
+    """Year to date, used when a description cannot be parsed at all."""
+    today = datetime.now()
+    return today.replace(day=1, month=1).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
+
 def resolve_dates(date_description: str) -> (str, str):
     """
     Resolves a natural language date description into a start and end date.
     Tries fast, deterministic methods first, then falls back to an LLM.
     """
+    try:
+        # Relative descriptions ("last year") depend on the current date, so it is part of the key
+        return _resolve_dates_cached(date_description, date.today())
+    except Exception:
+        # If LLM fails, use a final fallback (not cached, so the next call retries)
+        print(f"Warning: LLM date parsing failed for '{date_description}'. Using default.")
+        return _default_date_range()
+
+# Date resolution is cached in two layers:
+# - _resolve_dates_cached memoizes complete resolutions (deterministic rules or LLM) per
+#   description and day. It is the fast path for repeated resolve_dates calls.
+# - _llm_date_ranges holds only the LLM parses. It exists because resolve_dates_batch parses
+#   several descriptions in one request and must store the results for resolve_dates to pick
+#   up, which an lru_cache cannot be filled with. _resolve_dates_cached consults it before
+#   calling the LLM, so each description is sent to the LLM at most once per day.
+
+@lru_cache(maxsize=DATE_RANGE_CACHE_SIZE)
+def _resolve_dates_cached(date_description: str, today: date) -> Tuple[str, str]:
+    """(Internal) Memoized body of resolve_dates. Raises if the LLM fallback fails."""
+    resolved = _resolve_dates_locally(date_description)
+    if resolved is not None:
+        return resolved
+
+    # A batch request may already have parsed this description today
+    key = _llm_date_range_key(date_description, today)
+    hit, resolved = _llm_date_ranges.get(key)
+    if hit:
+        return resolved
+
+    # Fallback to LLM for complex cases
+    print(f"--- Using LLM to parse date description: '{date_description}' ---")
+    resolved = _get_llm_date_range(date_description)
+    _llm_date_ranges.put(key, resolved)
+    return resolved
+
+# LLM-parsed ranges, shared by resolve_dates and resolve_dates_batch (see above)
+_llm_date_ranges = ActionCache(maxsize=DATE_RANGE_CACHE_SIZE, cache_dir=None)
+
+def _llm_date_range_key(date_description: str, today: date) -> str:
+    return ActionCache.make_key("date_range", {"description": date_description, "today": today.isoformat()})
+
+def resolve_dates_batch(date_descriptions: List[str]) -> Dict[str, Tuple[str, str]]:
+    """
+    Resolves several date descriptions at once.
+    Descriptions that the deterministic rules cannot handle are sent to the LLM
+    in a single request rather than one request each.
+    """
+    resolved = {}
+    pending = []
+    for desc in dict.fromkeys(date_descriptions):
+        local = _resolve_dates_locally(desc)
+        if local is not None:
+            resolved[desc] = local
+        else:
+            pending.append(desc)
+
+    # Ask the LLM once for every description it has not already parsed today
+    today = date.today()
+    unparsed = [desc for desc in pending if not _llm_date_ranges.get(_llm_date_range_key(desc, today))[0]]
+    if len(unparsed) > 1:
+        try:
+            print(f"--- Using LLM to parse {len(unparsed)} date descriptions: {unparsed} ---")
+            for desc, date_range in _get_llm_date_ranges(unparsed).items():
+                _llm_date_ranges.put(_llm_date_range_key(desc, today), date_range)
+        except Exception:
+            print("Warning: batched LLM date parsing failed. Parsing the descriptions one at a time.")
+
+    # Parsed descriptions come from the shared cache; anything the batch missed gets its own parse
+    for desc in pending:
+        resolved[desc] = resolve_dates(desc)
+    return resolved
+
+def _resolve_dates_locally(date_description: str) -> Optional[Tuple[str, str]]:
+    """(Internal) The deterministic date rules. Returns None when the LLM is needed."""
     today = datetime.now()
     clean_desc = date_description.lower().strip()
 
@@ -258,9 +382,9 @@ def resolve_dates(date_description: str) -> (str, str):
     # Relative terms
     if "last year" in clean_desc:
         last_year = today.year - 1
-        return resolve_dates(str(last_year))
+        return _resolve_dates_locally(str(last_year))
     if "this year" in clean_desc:
-        return resolve_dates(str(today.year))
+        return _resolve_dates_locally(str(today.year))
 
     # Fallback for simple dates
     try:
@@ -274,16 +398,7 @@ def resolve_dates(date_description: str) -> (str, str):
         # This is not an error, just means it's not a simple date.
         pass
 
-    # Fallback to LLM for complex cases
-    try:
-        print(f"--- Using LLM to parse date description: '{date_description}' ---")
-        return _get_llm_date_range(date_description)
-    except Exception:
-        # If LLM fails, use a final fallback
-        print(f"Warning: LLM date parsing failed for '{date_description}'. Using default.")
-        end_date = today.strftime('%Y-%m-%d')
-        start_date = today.replace(day=1, month=1).strftime('%Y-%m-%d')
-        return start_date, end_date 
+    return None
 
 
 # --- Knowledge Base Accessor ---